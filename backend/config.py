@@ -1,8 +1,9 @@
 """
 Configuration settings for the Biometrics Attendance System
 """
-from pydantic_settings import BaseSettings
-from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional, Sequence, List
+from functools import cached_property
 
 
 class Settings(BaseSettings):
@@ -17,7 +18,8 @@ class Settings(BaseSettings):
     WFH_DAYS_PER_WEEK: int = 2  # Work From Home days per week
     
     # Expected weekly office hours (WFO days * hours per day)
-    @property
+    # Computed once; the settings are frozen after startup
+    @cached_property
     def expected_weekly_minutes(self) -> int:
         return self.WFO_DAYS_PER_WEEK * self.EXPECTED_HOURS_PER_DAY * 60
     
@@ -29,8 +31,16 @@ class Settings(BaseSettings):
     API_PREFIX: str = "/api"
     DEBUG: bool = True
     
-    class Config:
-        env_file = ".env"
+    # Seconds to cache dashboard report results, and how many to keep
+    REPORT_CACHE_TTL: int = 300
+    REPORT_CACHE_SIZE: int = 128
+    
+    # Seconds an upload may stay PENDING/PROCESSING before it is reported as FAILED
+    # (background jobs are lost if the worker running them restarts)
+    UPLOAD_JOB_TIMEOUT: int = 900
+    
+    # Settings are read once at startup and never mutated afterwards
+    model_config = SettingsConfigDict(env_file=".env", frozen=True)
 
 
 settings = Settings()
@@ -52,3 +62,35 @@ def get_status_color(percentage: float) -> str:
         return "AMBER"
     else:
         return "GREEN"
+
+
+def get_status_colors(
+    percentages: Sequence[float],
+    threshold_red: Optional[int] = None,
+    threshold_amber: Optional[int] = None
+) -> List[str]:
+    """
+    Vectorized get_status_color for a whole column of percentages
+    
+    Args:
+        percentages: Attendance compliance percentages (0-100+)
+        threshold_red: Override for settings.THRESHOLD_RED
+        threshold_amber: Override for settings.THRESHOLD_AMBER
+    
+    Returns:
+        Status color strings in the same order as percentages
+    """
+    import numpy as np  # Only needed on the upload/report paths
+    
+    if threshold_red is None:
+        threshold_red = settings.THRESHOLD_RED
+    if threshold_amber is None:
+        threshold_amber = settings.THRESHOLD_AMBER
+    
+    pcts = np.asarray(percentages, dtype=float)
+    colors = np.select(
+        [pcts < threshold_red, pcts <= threshold_amber],
+        ["RED", "AMBER"],
+        default="GREEN"
+    )
+    return colors.tolist()
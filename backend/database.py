@@ -1,17 +1,42 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateIndex
+import orjson
 from config import settings
 
 # Create SQLite engine
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
+    connect_args={"check_same_thread": False},  # Needed for SQLite
+    pool_pre_ping=True,
+    insertmanyvalues_page_size=10000,  # Rows per batched INSERT during uploads
+    json_deserializer=orjson.loads  # Decodes JSON columns (in_out_pairs) on every report row
 )
 
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _):
+        """
+        Tune each new SQLite connection for the ingest-heavy workload
+        
+        WAL lets readers and the upload writer run concurrently, and
+        synchronous=NORMAL only fsyncs at checkpoints instead of every commit.
+        """
+        cursor = dbapi_conn.cursor()
+        cursor.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA temp_store=MEMORY;"
+            "PRAGMA mmap_size=268435456;"  # 256 MB
+            "PRAGMA cache_size=-64000;"  # ~64 MB
+        )
+        cursor.close()
+
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -23,6 +48,10 @@ def get_db():
     """
     Dependency for getting database session
     Yields a database session and ensures it's closed after use
+    
+    Sessions are synchronous, so endpoints using them should be plain `def`
+    handlers; FastAPI then runs them in its threadpool instead of blocking
+    the event loop on every query.
     """
     db = SessionLocal()
     try:
@@ -33,5 +62,20 @@ def get_db():
 
 def init_db():
     """Initialize database tables"""
-    from models import employee, attendance, settings  # Import models to register them
+    from models import employee, attendance, settings, upload_job  # Import models to register them
     Base.metadata.create_all(bind=engine)
+    
+    # create_all skips existing tables, so add any nullable columns and
+    # indexes they are missing
+    # (IF NOT EXISTS also covers expression indexes, which reflection skips)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+            
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
@@ -4,6 +4,7 @@ Main application entry point
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import logging
 
 from config import settings
@@ -20,7 +21,8 @@ app = FastAPI(
     description="HR Attendance Management System with Biometric Data Processing",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse  # Faster serialization of large report payloads
 )
 
 # Configure CORS for React frontend
@@ -1,7 +1,7 @@
 """
 Attendance models for the Biometrics Attendance System
 """
-from sqlalchemy import Column, Integer, String, Date, Time, DateTime, ForeignKey, Enum, Text, Float
+from sqlalchemy import Column, Integer, String, Date, Time, DateTime, ForeignKey, Float, Index, CheckConstraint, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -25,26 +25,40 @@ class ComplianceStatus(str, enum.Enum):
     GREEN = "GREEN"
 
 
+def _status_check(status_enum) -> str:
+    """Build a CHECK expression limiting the status column to the enum's values"""
+    values = ", ".join(f"'{member.value}'" for member in status_enum)
+    return f"status IN ({values})"
+
+
 class AttendanceLog(Base):
     """Raw attendance log from biometric device"""
     
     __tablename__ = "attendance_logs"
     
     id = Column(Integer, primary_key=True, index=True)
-    employee_code = Column(String(20), ForeignKey("employees.code"), nullable=False, index=True)
+    employee_code = Column(String(20), ForeignKey("employees.code"), nullable=False)
     date = Column(Date, nullable=False, index=True)
     in_time = Column(Time, nullable=True)
     out_time = Column(Time, nullable=True)
     total_time = Column(Time, nullable=True)
+    in_minute = Column(Integer, nullable=True)  # in_time as minute of day
+    out_minute = Column(Integer, nullable=True)  # out_time as minute of day
     shift = Column(Integer, nullable=True)
     late_minutes = Column(Integer, default=0)
     overtime_minutes = Column(Integer, default=0)
     remark = Column(String(10), nullable=True)
+    upload_id = Column(Integer, ForeignKey("upload_jobs.id"), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationship
     employee = relationship("Employee", back_populates="attendance_logs")
     
+    # Composite index for per-employee date lookups
+    __table_args__ = (
+        Index('ix_log_emp_date', 'employee_code', 'date'),
+    )
+    
     def __repr__(self):
         return f"<AttendanceLog(employee={self.employee_code}, date={self.date}, in={self.in_time}, out={self.out_time})>"
 
@@ -55,11 +69,11 @@ class DailyAttendance(Base):
     __tablename__ = "daily_attendance"
     
     id = Column(Integer, primary_key=True, index=True)
-    employee_code = Column(String(20), ForeignKey("employees.code"), nullable=False, index=True)
-    date = Column(Date, nullable=False, index=True)
+    employee_code = Column(String(20), ForeignKey("employees.code"), nullable=False)
+    date = Column(Date, nullable=False)
     total_office_minutes = Column(Integer, default=0)
-    status = Column(Enum(AttendanceStatus), nullable=False, default=AttendanceStatus.ABSENT)
-    in_out_pairs = Column(Text, nullable=True)  # JSON string of IN/OUT pairs
+    status = Column(String(10), nullable=False, default=AttendanceStatus.ABSENT.value)
+    in_out_pairs = Column(JSON(none_as_null=True), nullable=True)  # List of IN/OUT pairs
     first_in = Column(Time, nullable=True)
     last_out = Column(Time, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -67,9 +81,12 @@ class DailyAttendance(Base):
     # Relationship
     employee = relationship("Employee", back_populates="daily_summaries")
     
-    # Unique constraint on employee_code and date
+    # One row per employee per day; also serves employee + date range lookups.
+    # Date + status backs the per-day dashboard counts and date lookups.
     __table_args__ = (
-        # UniqueConstraint handled by unique index
+        Index('ix_daily_emp_date', 'employee_code', 'date', unique=True),
+        Index('ix_daily_date_status', 'date', 'status'),
+        CheckConstraint(_status_check(AttendanceStatus), name='ck_daily_status'),
     )
     
     def __repr__(self):
@@ -82,18 +99,25 @@ class WeeklySummary(Base):
     __tablename__ = "weekly_summary"
     
     id = Column(Integer, primary_key=True, index=True)
-    employee_code = Column(String(20), ForeignKey("employees.code"), nullable=False, index=True)
-    week_start = Column(Date, nullable=False, index=True)
+    employee_code = Column(String(20), ForeignKey("employees.code"), nullable=False)
+    week_start = Column(Date, nullable=False)
     week_end = Column(Date, nullable=False)
     total_office_minutes = Column(Integer, default=0)
     wfo_days = Column(Integer, default=0)
     expected_minutes = Column(Integer, default=960)  # 2 days * 8 hours * 60 mins
     compliance_percentage = Column(Float, default=0.0)
-    status = Column(Enum(ComplianceStatus), nullable=False, default=ComplianceStatus.RED)
+    status = Column(String(10), nullable=False, default=ComplianceStatus.RED.value)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationship
     employee = relationship("Employee", back_populates="weekly_summaries")
     
+    # One row per employee per week; week + employee backs the per-week reports
+    __table_args__ = (
+        Index('ix_weekly_emp_week', 'employee_code', 'week_start', unique=True),
+        Index('ix_weekly_week_emp', 'week_start', 'employee_code'),
+        CheckConstraint(_status_check(ComplianceStatus), name='ck_weekly_status'),
+    )
+    
     def __repr__(self):
         return f"<WeeklySummary(employee={self.employee_code}, week={self.week_start}, compliance={self.compliance_percentage}%)>"
@@ -1,7 +1,7 @@
 """
 Employee model for the Biometrics Attendance System
 """
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import sys
@@ -27,5 +27,11 @@ class Employee(Base):
     daily_summaries = relationship("DailyAttendance", back_populates="employee")
     weekly_summaries = relationship("WeeklySummary", back_populates="employee")
     
+    # Expression indexes backing case-insensitive prefix search
+    __table_args__ = (
+        Index('ix_emp_lower_name', func.lower(name)),
+        Index('ix_emp_lower_code', func.lower(code)),
+    )
+    
     def __repr__(self):
         return f"<Employee(code={self.code}, name={self.name})>"
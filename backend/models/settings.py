@@ -23,3 +23,4 @@ class AppSettings(Base):
     THRESHOLD_RED = "threshold_red"
     THRESHOLD_AMBER = "threshold_amber"
     MIN_HOURS_FOR_PRESENT = "min_hours_for_present"  # Minimum hours to count as PRESENT
+    DATA_VERSION = "last_ingest_ts"  # Changes whenever report data or settings change
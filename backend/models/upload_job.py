@@ -0,0 +1,52 @@
+"""
+Upload Job Model
+Tracks the background summary calculation for an uploaded file
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, CheckConstraint
+from datetime import datetime
+import enum
+from database import Base
+from models.attendance import _status_check
+
+
+class UploadStatus(str, enum.Enum):
+    """Processing status of an upload"""
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+
+class UploadJob(Base):
+    """An uploaded attendance file and its processing stats"""
+    
+    __tablename__ = "upload_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String(255), nullable=False)
+    status = Column(String(10), nullable=False, default=UploadStatus.PENDING.value)
+    records_parsed = Column(Integer, default=0)
+    employees_created = Column(Integer, default=0)
+    attendance_logs_created = Column(Integer, default=0)
+    daily_summaries_created = Column(Integer, default=0)
+    weekly_summaries_created = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        CheckConstraint(_status_check(UploadStatus), name='ck_upload_status'),
+    )
+    
+    def __repr__(self):
+        return f"<UploadJob(id={self.id}, file={self.filename}, status={self.status})>"
+    
+    def get_stats(self) -> dict:
+        """Processing stats in the upload response format"""
+        return {
+            "records_parsed": self.records_parsed,
+            "employees_created": self.employees_created,
+            "attendance_logs_created": self.attendance_logs_created,
+            "daily_summaries_created": self.daily_summaries_created,
+            "weekly_summaries_created": self.weekly_summaries_created
+        }
@@ -4,37 +4,109 @@ Handles employee-related API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy import func, select, update, and_, bindparam
 from typing import List, Optional
+import string
 
 from database import get_db
 from models.employee import Employee
 from models.attendance import DailyAttendance, WeeklySummary
+from routers.settings import bump_data_version
 
 router = APIRouter(prefix="/employees", tags=["employees"])
 
+# Hot lookups built once at import so SQLAlchemy can reuse their compiled form
+# Only the columns the responses need are selected, so no ORM instances are built
+EMPLOYEE_COLUMNS = (Employee.id, Employee.code, Employee.name, Employee.department)
+
+STMT_EMP_BY_CODE = select(*EMPLOYEE_COLUMNS).where(Employee.code == bindparam("code"))
+
+STMT_EMP_WITH_STATS = select(
+    *EMPLOYEE_COLUMNS,
+    select(func.count(DailyAttendance.id)).where(
+        DailyAttendance.employee_code == bindparam("code")
+    ).scalar_subquery().label("daily_count"),
+    select(func.count(WeeklySummary.id)).where(
+        WeeklySummary.employee_code == bindparam("code")
+    ).scalar_subquery().label("weekly_count")
+).where(Employee.code == bindparam("code"))
+
+# SQLite's built-in lower() only folds ASCII, so search terms are folded the same way
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Largest code point; a prefix ending in it has no successor character
+MAX_CODE_POINT = 0x10FFFF
+
+# Surrogates are not characters and cannot be encoded, so successors skip them
+SURROGATES = range(0xD800, 0xE000)
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Smallest string greater than every string starting with prefix
+    
+    Trailing MAX_CODE_POINT characters cannot be incremented, so they are
+    dropped and the character before them is bumped instead. Returns None
+    when every character is MAX_CODE_POINT (no upper bound exists).
+    """
+    stem = prefix.rstrip(chr(MAX_CODE_POINT))
+    if not stem:
+        return None
+    successor = ord(stem[-1]) + 1
+    if successor in SURROGATES:
+        successor = SURROGATES.stop
+    return stem[:-1] + chr(successor)
+
+
+def prefix_match(column, prefix: str):
+    """Range filter for lower(column) starting with prefix, usable by the expression index"""
+    lowered = func.lower(column)
+    upper = prefix_upper_bound(prefix)
+    if upper is None:
+        return lowered >= prefix
+    return and_(lowered >= prefix, lowered < upper)
+
 
 @router.get("/")
-async def list_employees(
-    search: Optional[str] = Query(None, description="Search by name or code"),
+def list_employees(
+    search: Optional[str] = Query(None, description="Search by name or code prefix"),
+    contains: bool = Query(False, description="Match search anywhere in name or code (slower)"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
     """
     List all employees with optional search
+    
+    Search matches the start of the name or code unless contains is set.
     """
-    query = db.query(Employee)
+    # Total count is returned alongside each page row via a window function
+    query = db.query(*EMPLOYEE_COLUMNS, func.count().over().label("total"))
     
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (Employee.name.ilike(search_term)) | 
-            (Employee.code.ilike(search_term))
-        )
+        term = search.translate(ASCII_LOWER)
+        if contains:
+            search_term = f"%{term}%"
+            query = query.filter(
+                (func.lower(Employee.name).like(search_term)) | 
+                (func.lower(Employee.code).like(search_term))
+            )
+        else:
+            # Prefix match as a range so the lower(name)/lower(code) indexes are used
+            query = query.filter(
+                prefix_match(Employee.name, term) | prefix_match(Employee.code, term)
+            )
     
-    total = query.count()
     employees = query.offset(skip).limit(limit).all()
     
+    if employees:
+        total = employees[0].total
+    elif skip:
+        # Page is past the end, so no row carried the total
+        total = query.with_entities(func.count(Employee.id)).scalar()
+    else:
+        total = 0
+    
     return {
         "total": total,
         "employees": [
@@ -50,41 +122,33 @@ async def list_employees(
 
 
 @router.get("/{employee_code}")
-async def get_employee(
+def get_employee(
     employee_code: str,
     db: Session = Depends(get_db)
 ):
     """
     Get single employee details
     """
-    employee = db.query(Employee).filter(Employee.code == employee_code).first()
+    # Fetch employee together with attendance stats in one round-trip
+    row = db.execute(STMT_EMP_WITH_STATS, {"code": employee_code}).first()
     
-    if not employee:
+    if not row:
         raise HTTPException(status_code=404, detail="Employee not found")
     
-    # Get attendance stats
-    daily_count = db.query(DailyAttendance).filter(
-        DailyAttendance.employee_code == employee_code
-    ).count()
-    
-    weekly_count = db.query(WeeklySummary).filter(
-        WeeklySummary.employee_code == employee_code
-    ).count()
-    
     return {
-        "id": employee.id,
-        "code": employee.code,
-        "name": employee.name,
-        "department": employee.department,
+        "id": row.id,
+        "code": row.code,
+        "name": row.name,
+        "department": row.department,
         "stats": {
-            "total_days_recorded": daily_count,
-            "total_weeks_recorded": weekly_count
+            "total_days_recorded": row.daily_count,
+            "total_weeks_recorded": row.weekly_count
         }
     }
 
 
 @router.put("/{employee_code}")
-async def update_employee(
+def update_employee(
     employee_code: str,
     name: Optional[str] = None,
     department: Optional[str] = None,
@@ -93,18 +157,27 @@ async def update_employee(
     """
     Update employee details
     """
-    employee = db.query(Employee).filter(Employee.code == employee_code).first()
-    
-    if not employee:
-        raise HTTPException(status_code=404, detail="Employee not found")
-    
+    changes = {}
     if name:
-        employee.name = name
+        changes["name"] = name
     if department:
-        employee.department = department
+        changes["department"] = department
+    
+    if changes:
+        result = db.execute(
+            update(Employee).where(Employee.code == employee_code).values(**changes)
+        )
+        if result.rowcount == 0:
+            # Unknown code: leave the data version (and every cached ETag) alone
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Employee not found")
+        bump_data_version(db)
+        db.commit()
     
-    db.commit()
-    db.refresh(employee)
+    employee = db.execute(STMT_EMP_BY_CODE, {"code": employee_code}).first()
+    
+    if not employee:
+        raise HTTPException(status_code=404, detail="Employee not found")
     
     return {
         "id": employee.id,
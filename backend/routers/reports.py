@@ -2,16 +2,19 @@
 Reports Router
 Handles report generation API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, Iterable, Iterator
 from datetime import date, datetime
 import csv
 import io
+from itertools import islice, chain
+from operator import itemgetter
 
 from database import get_db
 from services.report_generator import ReportGenerator
+from routers.settings import check_etag
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
@@ -26,19 +29,84 @@ def parse_date(date_str: Optional[str]) -> Optional[date]:
         return None
 
 
+def report_response(content, response: Optional[Response] = None) -> ORJSONResponse:
+    """
+    Serialize a report payload straight to orjson
+    
+    Returning the response skips FastAPI's jsonable_encoder pass over every
+    row; report payloads only hold JSON-native values and dates, which
+    orjson encodes itself. Headers set on the injected response (the ETag)
+    are carried over.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return ORJSONResponse(content, headers=headers)
+
+
+# Exports with at least this many rows are streamed instead of sent in one body
+CSV_STREAM_THRESHOLD = 500
+
+# Field accessors for the daily records section of the individual CSV export
+DAILY_RECORD_FIELDS = itemgetter('date', 'day', 'first_in', 'last_out')
+DAILY_RECORD_TOTALS = itemgetter('total_hours', 'status')
+
+
+def stream_csv(rows: Iterable[Iterable], chunk_size: int = 100) -> Iterator[str]:
+    """Yield CSV text in chunks of rows instead of buffering the whole file"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+def csv_response(rows: Iterable[Iterable], filename: str) -> Response:
+    """
+    Build a CSV download response
+    
+    Exports with fewer than CSV_STREAM_THRESHOLD rows are sent as a single
+    body; larger ones are streamed in chunks.
+    """
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    rows = iter(rows)
+    head = list(islice(rows, CSV_STREAM_THRESHOLD))
+    
+    if len(head) < CSV_STREAM_THRESHOLD:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(head)
+        return Response(content=buffer.getvalue(), media_type="text/csv", headers=headers)
+    
+    return StreamingResponse(
+        stream_csv(chain(head, rows)),
+        media_type="text/csv",
+        headers=headers
+    )
+
+
 @router.get("/dashboard")
-async def get_dashboard_summary(
+def get_dashboard_summary(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
     Get dashboard summary statistics
     """
+    not_modified = check_etag(request, response, db)
+    if not_modified:
+        return not_modified
+    
     generator = ReportGenerator(db)
-    return generator.get_dashboard_summary()
+    return report_response(generator.get_dashboard_summary(), response)
 
 
 @router.get("/dashboard-stats")
-async def get_dashboard_daily_stats(
+def get_dashboard_daily_stats(
     week_start: Optional[str] = Query(None, description="Week start date (YYYY-MM-DD)"),
     db: Session = Depends(get_db)
 ):
@@ -47,11 +115,11 @@ async def get_dashboard_daily_stats(
     """
     generator = ReportGenerator(db)
     week_date = parse_date(week_start)
-    return generator.get_dashboard_daily_stats(week_start=week_date)
+    return report_response(generator.get_dashboard_daily_stats(week_start=week_date))
 
 
 @router.get("/daily-details")
-async def get_daily_details(
+def get_daily_details(
     date: str = Query(..., description="Date (YYYY-MM-DD)"),
     status: str = Query("WFO", description="Status category: WFO or WFH"),
     db: Session = Depends(get_db)
@@ -60,15 +128,17 @@ async def get_daily_details(
     Get details of employees for specific day and status
     """
     generator = ReportGenerator(db)
-    return generator.get_daily_details(date_str=date, status_category=status)
+    return report_response(generator.get_daily_details(date_str=date, status_category=status))
 
 
 @router.get("/all-employees")
-async def get_all_employees_report(
+def get_all_employees_report(
     week_start: Optional[str] = Query(None, description="Week start date (YYYY-MM-DD)"),
     sort_by: str = Query("name", description="Sort by: name, compliance, hours, status"),
     sort_order: str = Query("asc", description="Sort order: asc, desc"),
     status_filter: Optional[str] = Query(None, description="Filter by status: RED, AMBER, GREEN"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum employees to return"),
+    offset: int = Query(0, ge=0, description="Number of employees to skip"),
     db: Session = Depends(get_db)
 ):
     """
@@ -77,19 +147,21 @@ async def get_all_employees_report(
     generator = ReportGenerator(db)
     week_date = parse_date(week_start)
     
-    return {
+    return report_response({
         "employees": generator.get_all_employees_report(
             week_start=week_date,
             sort_by=sort_by,
             sort_order=sort_order,
-            status_filter=status_filter
+            status_filter=status_filter,
+            limit=limit,
+            offset=offset
         ),
         "available_weeks": generator.get_available_weeks()
-    }
+    })
 
 
 @router.get("/individual/{employee_code}")
-async def get_individual_report(
+def get_individual_report(
     employee_code: str,
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
@@ -109,39 +181,51 @@ async def get_individual_report(
     if not report:
         raise HTTPException(status_code=404, detail="Employee not found")
     
-    return report
+    return report_response(report)
 
 
 @router.get("/wfo-compliance")
-async def get_wfo_compliance_report(
+def get_wfo_compliance_report(
+    request: Request,
+    response: Response,
     week_start: Optional[str] = Query(None, description="Week start date (YYYY-MM-DD)"),
     db: Session = Depends(get_db)
 ):
     """
     Get WFO compliance report
     """
+    not_modified = check_etag(request, response, db)
+    if not_modified:
+        return not_modified
+    
     generator = ReportGenerator(db)
     week_date = parse_date(week_start)
     
     report = generator.get_wfo_compliance_report(week_start=week_date)
-    report['available_weeks'] = generator.get_available_weeks()
     
-    return report
+    # Cached reports are shared, so extend a copy
+    return report_response({**report, 'available_weeks': generator.get_available_weeks()}, response)
 
 
 @router.get("/weeks")
-async def get_available_weeks(
+def get_available_weeks(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
     Get list of available weeks
     """
+    not_modified = check_etag(request, response, db)
+    if not_modified:
+        return not_modified
+    
     generator = ReportGenerator(db)
-    return {"weeks": generator.get_available_weeks()}
+    return report_response({"weeks": generator.get_available_weeks()}, response)
 
 
 @router.get("/export/all-employees")
-async def export_all_employees_csv(
+def export_all_employees_csv(
     week_start: Optional[str] = Query(None, description="Week start date (YYYY-MM-DD)"),
     db: Session = Depends(get_db)
 ):
@@ -151,43 +235,32 @@ async def export_all_employees_csv(
     generator = ReportGenerator(db)
     week_date = parse_date(week_start)
     
-    employees = generator.get_all_employees_report(week_start=week_date)
-    
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow([
-        'Employee Code', 'Employee Name', 'Department', 
-        'Total Office Hours', 'WFO Days', 'Expected Hours',
-        'Compliance %', 'Status'
-    ])
+    def rows():
+        # Header
+        yield [
+            'Employee Code', 'Employee Name', 'Department', 
+            'Total Office Hours', 'WFO Days', 'Expected Hours',
+            'Compliance %', 'Status'
+        ]
+        
+        # Data rows
+        for emp in generator.iter_all_employees_report(week_start=week_date):
+            yield [
+                emp['employee_code'],
+                emp['employee_name'],
+                emp['department'] or '',
+                emp['total_office_hours'],
+                emp['wfo_days'],
+                emp['expected_hours'],
+                f"{emp['compliance_percentage']:.2f}%",
+                emp['status']
+            ]
     
-    # Data rows
-    for emp in employees:
-        writer.writerow([
-            emp['employee_code'],
-            emp['employee_name'],
-            emp['department'] or '',
-            emp['total_office_hours'],
-            emp['wfo_days'],
-            emp['expected_hours'],
-            f"{emp['compliance_percentage']:.2f}%",
-            emp['status']
-        ])
-    
-    output.seek(0)
-    
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=all_employees_report.csv"}
-    )
+    return csv_response(rows(), "all_employees_report.csv")
 
 
 @router.get("/export/wfo-compliance")
-async def export_wfo_compliance_csv(
+def export_wfo_compliance_csv(
     week_start: Optional[str] = Query(None, description="Week start date (YYYY-MM-DD)"),
     db: Session = Depends(get_db)
 ):
@@ -199,41 +272,32 @@ async def export_wfo_compliance_csv(
     
     report = generator.get_wfo_compliance_report(week_start=week_date)
     
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow([
-        'Employee Code', 'Employee Name', 
-        'WFO Days', 'Actual Hours', 'Expected Hours',
-        'Compliance %', 'Status', 'Compliant'
-    ])
-    
-    # Data rows
-    for emp in report['employees']:
-        writer.writerow([
-            emp['employee_code'],
-            emp['employee_name'],
-            emp['wfo_days'],
-            emp['actual_hours'],
-            emp['expected_hours'],
-            f"{emp['compliance_percentage']:.2f}%",
-            emp['status'],
-            'Yes' if emp['is_compliant'] else 'No'
-        ])
-    
-    output.seek(0)
+    def rows():
+        # Header
+        yield [
+            'Employee Code', 'Employee Name', 
+            'WFO Days', 'Actual Hours', 'Expected Hours',
+            'Compliance %', 'Status', 'Compliant'
+        ]
+        
+        # Data rows
+        for emp in report['employees']:
+            yield [
+                emp['employee_code'],
+                emp['employee_name'],
+                emp['wfo_days'],
+                emp['actual_hours'],
+                emp['expected_hours'],
+                f"{emp['compliance_percentage']:.2f}%",
+                emp['status'],
+                'Yes' if emp['is_compliant'] else 'No'
+            ]
     
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=wfo_compliance_report.csv"}
-    )
+    return csv_response(rows(), "wfo_compliance_report.csv")
 
 
 @router.get("/export/individual/{employee_code}")
-async def export_individual_csv(
+def export_individual_csv(
     employee_code: str,
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
@@ -253,59 +317,35 @@ async def export_individual_csv(
     if not report:
         raise HTTPException(status_code=404, detail="Employee not found")
     
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Employee info
-    writer.writerow(['Employee Report'])
-    writer.writerow(['Code', report['employee']['code']])
-    writer.writerow(['Name', report['employee']['name']])
-    writer.writerow(['Department', report['employee']['department'] or ''])
-    if start_date or end_date:
-        writer.writerow(['Period', f"{start_date or 'Start'} to {end_date or 'End'}"])
-    writer.writerow([])
-    
-    # Summary
-    writer.writerow(['Summary'])
-    writer.writerow(['Total Office Hours', report['summary']['total_office_hours']])
-    writer.writerow(['Total WFO Days', report['summary']['total_wfo_days']])
-    writer.writerow(['Average Compliance', f"{report['summary']['avg_compliance']}%"])
-    writer.writerow(['Overall Status', report['summary']['overall_status']])
-    writer.writerow([])
-    
-    # Daily records
-    writer.writerow(['Daily Records'])
-    writer.writerow(['Date', 'Day', 'First In', 'Last Out', 'Time Logs (All Punches)', 'Total Hours', 'Status'])
-    
-    for day in report['daily_records']:
-        # Format time logs
-        time_logs = ""
-        if day.get('in_out_pairs'):
-            logs = []
-            for pair in day['in_out_pairs']:
-                # pair is {in: "HH:MM", out: "HH:MM"} or {in: "HH:MM", out: None}
-                # Check structure of in_out_pairs from report_generator.
-                # It loads JSON. The structure in generator is list of dicts.
-                p_in = pair.get('in', '-')
-                p_out = pair.get('out', '-')
-                logs.append(f"{p_in}-{p_out}")
-            time_logs = ", ".join(logs)
+    def rows():
+        # Employee info
+        yield ['Employee Report']
+        yield ['Code', report['employee']['code']]
+        yield ['Name', report['employee']['name']]
+        yield ['Department', report['employee']['department'] or '']
+        if start_date or end_date:
+            yield ['Period', f"{start_date or 'Start'} to {end_date or 'End'}"]
+        yield []
+        
+        # Summary
+        yield ['Summary']
+        yield ['Total Office Hours', report['summary']['total_office_hours']]
+        yield ['Total WFO Days', report['summary']['total_wfo_days']]
+        yield ['Average Compliance', f"{report['summary']['avg_compliance']}%"]
+        yield ['Overall Status', report['summary']['overall_status']]
+        yield []
+        
+        # Daily records
+        yield ['Daily Records']
+        yield ['Date', 'Day', 'First In', 'Last Out', 'Time Logs (All Punches)', 'Total Hours', 'Status']
+        
+        for day in report['daily_records']:
+            # Format time logs; pairs are {in: "HH:MM", out: "HH:MM" or None}
+            time_logs = ", ".join(
+                f"{pair.get('in', '-')}-{pair.get('out', '-')}"
+                for pair in day.get('in_out_pairs') or ()
+            )
             
-        writer.writerow([
-            day['date'],
-            day['day'],
-            day['first_in'],
-            day['last_out'],
-            time_logs,
-            day['total_hours'],
-            day['status']
-        ])
-    
-    output.seek(0)
+            yield (*DAILY_RECORD_FIELDS(day), time_logs, *DAILY_RECORD_TOTALS(day))
     
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename={employee_code}_report.csv"}
-    )
+    return csv_response(rows(), f"{employee_code}_report.csv")
@@ -2,10 +2,14 @@
 Settings Router
 Handles settings API endpoints
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
-from typing import Dict
-from pydantic import BaseModel
+from sqlalchemy import select, bindparam, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Annotated, Dict, Optional
+from pydantic import BaseModel, ConfigDict, Field
+import time
 
 from database import get_db
 from models.settings import AppSettings
@@ -13,92 +17,191 @@ from config import settings as default_settings
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
+# Defaults used when a key has not been saved to the database yet
+SETTING_DEFAULTS = {
+    AppSettings.EXPECTED_HOURS_PER_DAY: default_settings.EXPECTED_HOURS_PER_DAY,
+    AppSettings.WFO_DAYS_PER_WEEK: default_settings.WFO_DAYS_PER_WEEK,
+    AppSettings.WFH_DAYS_PER_WEEK: default_settings.WFH_DAYS_PER_WEEK,
+    AppSettings.THRESHOLD_RED: default_settings.THRESHOLD_RED,
+    AppSettings.THRESHOLD_AMBER: default_settings.THRESHOLD_AMBER,
+    AppSettings.MIN_HOURS_FOR_PRESENT: 6,  # Default 6 hours
+}
+
+# Lookups built once at import so SQLAlchemy can reuse their compiled form
+STMT_SETTING_BY_KEY = select(AppSettings).where(AppSettings.key == bindparam("key"))
+
+STMT_SETTING_VALUES = select(AppSettings.key, AppSettings.value).where(
+    AppSettings.key.in_(list(SETTING_DEFAULTS))
+)
+
+# Process-level cache of setting values, tagged with the data version they were read at
+_settings_cache: Dict = {"values": None, "version": None}
+
+
+# Constrained field types so validation stays on pydantic's integer fast path
+Hours = Annotated[int, Field(ge=0, le=24)]
+Days = Annotated[int, Field(ge=0, le=7)]
+Percentage = Annotated[int, Field(ge=0, le=100)]
+
 
 class SettingsUpdate(BaseModel):
     """Request model for updating settings"""
-    expected_hours_per_day: int = 8
-    wfo_days_per_week: int = 2
-    wfh_days_per_week: int = 3
-    threshold_red: int = 70
-    threshold_amber: int = 90
-    min_hours_for_present: int = 6  # Minimum hours to count as PRESENT
+    model_config = ConfigDict(frozen=True)
+    
+    expected_hours_per_day: Hours = 8
+    wfo_days_per_week: Days = 2
+    wfh_days_per_week: Days = 3
+    threshold_red: Percentage = 70
+    threshold_amber: Percentage = 90
+    min_hours_for_present: Hours = 6  # Minimum hours to count as PRESENT
 
 
 def get_setting_value(db: Session, key: str, default: str) -> str:
     """Get a setting value from database or return default"""
-    setting = db.query(AppSettings).filter(AppSettings.key == key).first()
+    setting = db.execute(STMT_SETTING_BY_KEY, {"key": key}).scalar_one_or_none()
     return setting.value if setting else default
 
 
+def load_settings(db: Session, data_version: Optional[str] = None) -> Dict[str, int]:
+    """
+    Get all setting values keyed by AppSettings key, falling back to defaults
+    
+    Values are cached per process until the data version changes. Every
+    settings write bumps that version in the database, so a worker that did
+    not handle the write still drops its copy on the next lookup. Callers
+    that already read the version (check_etag, cached_report) pass it in,
+    so a cache hit needs no query at all.
+    """
+    version = data_version if data_version is not None else get_data_version(db)
+    if _settings_cache["values"] is not None and _settings_cache["version"] == version:
+        return _settings_cache["values"]
+    
+    rows = db.execute(STMT_SETTING_VALUES).all()
+    stored = {key: value for key, value in rows}
+    
+    values = {
+        key: int(stored.get(key, default))
+        for key, default in SETTING_DEFAULTS.items()
+    }
+    
+    _settings_cache["values"] = values
+    _settings_cache["version"] = version
+    return values
+
+
+def invalidate_settings_cache() -> None:
+    """Drop cached settings so the next lookup reads from the database"""
+    _settings_cache["values"] = None
+    _settings_cache["version"] = None
+
+
 def set_setting_value(db: Session, key: str, value: str) -> None:
     """Set a setting value in database"""
-    setting = db.query(AppSettings).filter(AppSettings.key == key).first()
-    if setting:
-        setting.value = value
+    set_setting_values(db, {key: value})
+
+
+def set_setting_values(db: Session, values: Dict[str, str]) -> None:
+    """Insert or update several setting values with a single upsert statement"""
+    if db.get_bind().dialect.name == "postgresql":
+        insert = postgresql_insert
     else:
-        setting = AppSettings(key=key, value=value)
-        db.add(setting)
+        insert = sqlite_insert
+    
+    stmt = insert(AppSettings).values([
+        {"key": key, "value": value} for key, value in values.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AppSettings.key],
+        set_={"value": stmt.excluded.value, "updated_at": func.now()}
+    )
+    db.execute(stmt)
+
+
+def get_data_version(db: Session) -> str:
+    """Get the marker that changes whenever report data or settings change"""
+    return get_setting_value(db, AppSettings.DATA_VERSION, "0")
+
+
+def bump_data_version(db: Session) -> None:
+    """Record that report data or settings changed (committed with the caller's transaction)"""
+    set_setting_value(db, AppSettings.DATA_VERSION, new_data_version())
+
+
+def new_data_version() -> str:
+    """Generate a fresh data version marker"""
+    return str(time.time_ns())
+
+
+def check_etag(request: Request, response: Response, db: Session) -> Optional[Response]:
+    """
+    Tag a read-only response with the current data version
+    
+    Returns a 304 response when the client already holds that version,
+    otherwise sets the ETag header on the response and returns None.
+    Clients must revalidate on every use so new uploads show up at once.
+    The version is kept on request.state.data_version for the handler.
+    """
+    request.state.data_version = get_data_version(db)
+    etag = f'W/"{request.state.data_version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return None
 
 
 @router.get("")
-async def get_settings(db: Session = Depends(get_db)) -> Dict:
+def get_settings(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+) -> Dict:
     """
     Get all application settings
     """
-    expected_hours = int(get_setting_value(
-        db, AppSettings.EXPECTED_HOURS_PER_DAY, 
-        str(default_settings.EXPECTED_HOURS_PER_DAY)
-    ))
-    wfo_days = int(get_setting_value(
-        db, AppSettings.WFO_DAYS_PER_WEEK, 
-        str(default_settings.WFO_DAYS_PER_WEEK)
-    ))
-    wfh_days = int(get_setting_value(
-        db, AppSettings.WFH_DAYS_PER_WEEK, 
-        str(default_settings.WFH_DAYS_PER_WEEK)
-    ))
-    threshold_red = int(get_setting_value(
-        db, AppSettings.THRESHOLD_RED, 
-        str(default_settings.THRESHOLD_RED)
-    ))
-    threshold_amber = int(get_setting_value(
-        db, AppSettings.THRESHOLD_AMBER, 
-        str(default_settings.THRESHOLD_AMBER)
-    ))
-    min_hours = int(get_setting_value(
-        db, AppSettings.MIN_HOURS_FOR_PRESENT, 
-        "6"  # Default 6 hours
-    ))
+    not_modified = check_etag(request, response, db)
+    if not_modified:
+        return not_modified
+    
+    values = load_settings(db, request.state.data_version)
+    expected_hours = values[AppSettings.EXPECTED_HOURS_PER_DAY]
+    wfo_days = values[AppSettings.WFO_DAYS_PER_WEEK]
     
     return {
         "expected_hours_per_day": expected_hours,
         "wfo_days_per_week": wfo_days,
-        "wfh_days_per_week": wfh_days,
+        "wfh_days_per_week": values[AppSettings.WFH_DAYS_PER_WEEK],
         "expected_weekly_minutes": wfo_days * expected_hours * 60,
-        "min_hours_for_present": min_hours,
+        "min_hours_for_present": values[AppSettings.MIN_HOURS_FOR_PRESENT],
         "thresholds": {
-            "red": threshold_red,
-            "amber": threshold_amber
+            "red": values[AppSettings.THRESHOLD_RED],
+            "amber": values[AppSettings.THRESHOLD_AMBER]
         }
     }
 
 
 @router.put("")
-async def update_settings(
+def update_settings(
     settings_data: SettingsUpdate,
     db: Session = Depends(get_db)
 ) -> Dict:
     """
     Update application settings
     """
-    set_setting_value(db, AppSettings.EXPECTED_HOURS_PER_DAY, str(settings_data.expected_hours_per_day))
-    set_setting_value(db, AppSettings.WFO_DAYS_PER_WEEK, str(settings_data.wfo_days_per_week))
-    set_setting_value(db, AppSettings.WFH_DAYS_PER_WEEK, str(settings_data.wfh_days_per_week))
-    set_setting_value(db, AppSettings.THRESHOLD_RED, str(settings_data.threshold_red))
-    set_setting_value(db, AppSettings.THRESHOLD_AMBER, str(settings_data.threshold_amber))
-    set_setting_value(db, AppSettings.MIN_HOURS_FOR_PRESENT, str(settings_data.min_hours_for_present))
+    set_setting_values(db, {
+        AppSettings.EXPECTED_HOURS_PER_DAY: str(settings_data.expected_hours_per_day),
+        AppSettings.WFO_DAYS_PER_WEEK: str(settings_data.wfo_days_per_week),
+        AppSettings.WFH_DAYS_PER_WEEK: str(settings_data.wfh_days_per_week),
+        AppSettings.THRESHOLD_RED: str(settings_data.threshold_red),
+        AppSettings.THRESHOLD_AMBER: str(settings_data.threshold_amber),
+        AppSettings.MIN_HOURS_FOR_PRESENT: str(settings_data.min_hours_for_present),
+        AppSettings.DATA_VERSION: new_data_version(),
+    })
     
     db.commit()
+    invalidate_settings_cache()
     
     return {
         "message": "Settings updated successfully",
@@ -116,33 +219,14 @@ async def update_settings(
 
 
 # Helper function for other services to get settings
-def get_dynamic_settings(db: Session) -> Dict:
-    """Get settings as a dictionary for use in calculations"""
-    expected_hours = int(get_setting_value(
-        db, AppSettings.EXPECTED_HOURS_PER_DAY, 
-        str(default_settings.EXPECTED_HOURS_PER_DAY)
-    ))
-    wfo_days = int(get_setting_value(
-        db, AppSettings.WFO_DAYS_PER_WEEK, 
-        str(default_settings.WFO_DAYS_PER_WEEK)
-    ))
-    threshold_red = int(get_setting_value(
-        db, AppSettings.THRESHOLD_RED, 
-        str(default_settings.THRESHOLD_RED)
-    ))
-    threshold_amber = int(get_setting_value(
-        db, AppSettings.THRESHOLD_AMBER, 
-        str(default_settings.THRESHOLD_AMBER)
-    ))
-    min_hours = int(get_setting_value(
-        db, AppSettings.MIN_HOURS_FOR_PRESENT, 
-        "6"
-    ))
+def get_dynamic_settings(db: Session, data_version: Optional[str] = None) -> Dict:
+    """Get settings as a dictionary for use in calculations (see load_settings for data_version)"""
+    values = load_settings(db, data_version)
     
     return {
-        "expected_hours_per_day": expected_hours,
-        "wfo_days_per_week": wfo_days,
-        "threshold_red": threshold_red,
-        "threshold_amber": threshold_amber,
-        "min_hours_for_present": min_hours
+        "expected_hours_per_day": values[AppSettings.EXPECTED_HOURS_PER_DAY],
+        "wfo_days_per_week": values[AppSettings.WFO_DAYS_PER_WEEK],
+        "threshold_red": values[AppSettings.THRESHOLD_RED],
+        "threshold_amber": values[AppSettings.THRESHOLD_AMBER],
+        "min_hours_for_present": values[AppSettings.MIN_HOURS_FOR_PRESENT]
     }
@@ -2,25 +2,43 @@
 Upload Router
 Handles file upload and data processing
 """
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
 from typing import List
+import asyncio
 import logging
+import os
+import shutil
+import tempfile
 
-from database import get_db
-from services.attendance_parser import AttendanceParser
+from database import SessionLocal, get_db
 from services.time_calculator import TimeCalculator
 from models.employee import Employee
-from models.attendance import AttendanceLog, DailyAttendance, WeeklySummary, AttendanceStatus, ComplianceStatus
+from models.attendance import AttendanceLog, DailyAttendance, WeeklySummary, AttendanceStatus
+from models.upload_job import UploadJob, UploadStatus
 from config import settings
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
+# Parsing is CPU-bound, so it runs on its own small pool rather than the event loop
+PARSE_POOL = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="parse")
 
-@router.post("/")
+# Jobs in these states are still waiting on process_summaries
+UNFINISHED_STATUSES = (UploadStatus.PENDING.value, UploadStatus.PROCESSING.value)
+
+
+@router.post("/", status_code=202)
 async def upload_attendance_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
@@ -30,9 +48,10 @@ async def upload_attendance_file(
     This endpoint:
     1. Parses the uploaded file
     2. Extracts and stores employees
-    3. Stores raw attendance logs
-    4. Calculates daily summaries
-    5. Calculates weekly summaries
+    3. Stores raw attendance logs under a new upload job
+    4. Schedules the daily and weekly summary calculation in the background
+    
+    Poll GET /upload/{job_id} for the summary stats.
     """
     # Validate file type
     if not file.filename:
@@ -45,20 +64,31 @@ async def upload_attendance_file(
         )
     
     try:
-        # Read file content
-        content = await file.read()
-        
-        # Parse file
-        parser = AttendanceParser()
+        # Copy the upload to a temp file so the parser reads it from disk
+        # instead of holding the whole file in memory as bytes
+        # The file is removed however the copy or the parse ends
+        suffix = os.path.splitext(file.filename)[1]
+        tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
         try:
-            df, records = parser.parse_file(content, file.filename)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=f"File parsing error: {str(e)}")
-        except Exception as e:
-            logger.exception("Error parsing file")
-            raise HTTPException(status_code=400, detail=f"Could not parse file. Please check the format.")
-        
-        if not records:
+            with tmp:
+                await run_in_threadpool(shutil.copyfileobj, file.file, tmp, 1 << 20)
+            
+            # Parse file (parser pulls in pandas, so it is imported on first upload
+            # rather than at app startup)
+            from services.attendance_parser import AttendanceParser
+            parser = AttendanceParser()
+            try:
+                loop = asyncio.get_running_loop()
+                df = await loop.run_in_executor(PARSE_POOL, parser.parse_file, tmp.name, file.filename)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"File parsing error: {str(e)}")
+            except Exception as e:
+                logger.exception("Error parsing file")
+                raise HTTPException(status_code=400, detail=f"Could not parse file. Please check the format.")
+        finally:
+            os.unlink(tmp.name)
+        
+        if df.empty:
             error_msg = "No valid records found in the file."
             if parser.warnings:
                 error_msg += f" Warnings: {'; '.join(parser.warnings[:3])}"
@@ -67,45 +97,251 @@ async def upload_attendance_file(
                 detail=error_msg
             )
         
-        # Extract and store employees
-        employees = parser.get_unique_employees(records)
-        employees_created = 0
-        
-        for emp in employees:
-            existing = db.query(Employee).filter(Employee.code == emp['code']).first()
-            if not existing:
-                new_emp = Employee(
-                    code=emp['code'],
-                    name=emp['name'] or f"Employee {emp['code']}"
-                )
-                db.add(new_emp)
-                employees_created += 1
-            elif emp['name'] and not existing.name:
-                existing.name = emp['name']
+        # Store employees and raw logs off the event loop
+        job = await run_in_threadpool(store_upload, db, file.filename, parser, df)
         
-        db.commit()
+        background_tasks.add_task(process_summaries, job.id)
         
-        # Store raw attendance logs
-        logs_created = 0
-        for record in records:
-            log = AttendanceLog(
-                employee_code=record['code'],
-                date=record['date'],
-                in_time=record['in_time'],
-                out_time=record['out_time'],
-                total_time=record['total_time'],
-                shift=record['shift'],
-                late_minutes=record['late_minutes'],
-                overtime_minutes=record['overtime_minutes'],
-                remark=record['remark']
+        return {
+            "success": True,
+            "message": "File uploaded, calculating summaries",
+            "job_id": job.id,
+            "status": job.status,
+            "stats": job.get_stats(),
+            "warnings": parser.warnings[:10] if parser.warnings else [],
+            "errors": parser.errors[:10] if parser.errors else []
+        }
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error processing upload")
+        raise HTTPException(status_code=500, detail=f"Error processing file ({type(e).__name__}): {str(e)}")
+
+
+def store_upload(db: Session, filename: str, parser, df) -> UploadJob:
+    """
+    Store the employees and raw logs of a parsed upload under a new job
+    
+    Everything is written in one transaction; returns the committed job.
+    """
+    # Extract and store employees
+    employees = parser.get_unique_employees_df(df)
+    
+    # Fetch existing employees for the uploaded codes in one query
+    existing_employees = {
+        code: (emp_id, name)
+        for code, emp_id, name in db.query(Employee.code, Employee.id, Employee.name).filter(
+            Employee.code.in_([emp['code'] for emp in employees])
+        )
+    }
+    
+    employees_new = []
+    employee_name_updates = []
+    
+    for emp in employees:
+        existing = existing_employees.get(emp['code'])
+        if not existing:
+            employees_new.append({
+                'code': emp['code'],
+                'name': emp['name'] or f"Employee {emp['code']}"
+            })
+        elif emp['name'] and not existing[1]:
+            employee_name_updates.append({'id': existing[0], 'name': emp['name']})
+    
+    db.bulk_insert_mappings(Employee, employees_new)
+    db.bulk_update_mappings(Employee, employee_name_updates)
+    employees_created = len(employees_new)
+    
+    # Store raw attendance logs, tagged with the job that summarizes them
+    job = UploadJob(
+        filename=filename,
+        status=UploadStatus.PENDING.value,
+        records_parsed=len(df),
+        employees_created=employees_created
+    )
+    db.add(job)
+    db.flush()
+    
+    created_at = datetime.utcnow()
+    log_rows = list(zip(
+        df['code'], df['date'], df['in_time'], df['out_time'], df['in_minute'], df['out_minute'],
+        df['total_time'], df['shift'], df['late_minutes'], df['overtime_minutes'], df['remark'],
+        repeat(job.id), repeat(created_at)
+    ))
+    insert_logs(db, log_rows)
+    job.attendance_logs_created = len(log_rows)
+    
+    from routers.settings import bump_data_version
+    bump_data_version(db)
+    db.commit()
+    
+    db.refresh(job)
+    return job
+
+
+# Column order of the rows passed to insert_logs
+LOG_COLUMNS = (
+    'employee_code', 'date', 'in_time', 'out_time', 'in_minute', 'out_minute', 'total_time',
+    'shift', 'late_minutes', 'overtime_minutes', 'remark', 'upload_id', 'created_at'
+)
+
+
+def insert_logs(db: Session, rows: List[tuple]):
+    """
+    Insert raw attendance logs on the session's DBAPI connection
+    
+    Logs are the largest write of an upload, so they skip the ORM: Postgres
+    (psycopg 3) streams them with COPY, SQLite gets one executemany with the
+    values converted by the column types. Other databases use a Core
+    executemany.
+    """
+    connection = db.connection()
+    table = AttendanceLog.__table__
+    columns = ', '.join(LOG_COLUMNS)
+    cursor = connection.connection.dbapi_connection.cursor()
+    
+    try:
+        if connection.dialect.name == 'postgresql' and hasattr(cursor, 'copy'):
+            with cursor.copy(f"COPY {table.name} ({columns}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+        elif connection.dialect.name == 'sqlite':
+            processors = [
+                table.c[name].type.dialect_impl(connection.dialect).bind_processor(connection.dialect)
+                or (lambda value: value)
+                for name in LOG_COLUMNS
+            ]
+            placeholders = ', '.join('?' * len(LOG_COLUMNS))
+            cursor.executemany(
+                f"INSERT INTO {table.name} ({columns}) VALUES ({placeholders})",
+                (tuple(process(value) for process, value in zip(processors, row)) for row in rows)
             )
-            db.add(log)
-            logs_created += 1
-        
+        else:
+            insert_rows(db, AttendanceLog, [dict(zip(LOG_COLUMNS, row)) for row in rows])
+    finally:
+        cursor.close()
+
+
+# Rows per executemany batch for Core inserts and upserts
+WRITE_BATCH_SIZE = 1000
+
+
+def insert_rows(db: Session, model, rows: List[dict]):
+    """Insert row dicts with Core executemany batches, skipping ORM bulk bookkeeping"""
+    statement = model.__table__.insert()
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        db.execute(statement, rows[start:start + WRITE_BATCH_SIZE])
+
+
+def upsert_rows(db: Session, model, rows: List[dict], conflict_columns: List[str], exclude: List[str] = ()):
+    """
+    Insert row dicts, updating the existing row on a unique-key conflict
+    
+    Uses INSERT ... ON CONFLICT DO UPDATE (Postgres/SQLite) in executemany
+    batches. Every other column of the row dicts except `exclude` is overwritten.
+    """
+    if not rows:
+        return
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    
+    stmt = insert(model.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=conflict_columns,
+        set_={
+            column: stmt.excluded[column]
+            for column in rows[0]
+            if column not in conflict_columns and column not in exclude
+        }
+    )
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        db.execute(stmt, rows[start:start + WRITE_BATCH_SIZE])
+
+
+@router.get("/{job_id}")
+def get_upload_job(job_id: int, db: Session = Depends(get_db)):
+    """Get the processing status and stats of an upload"""
+    job = db.get(UploadJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    
+    if job.status in UNFINISHED_STATUSES:
+        fail_stale_job(db, job)
+    
+    messages = {
+        UploadStatus.PENDING.value: "File uploaded, calculating summaries",
+        UploadStatus.PROCESSING.value: "File uploaded, calculating summaries",
+        UploadStatus.COMPLETED.value: "File processed successfully",
+        UploadStatus.FAILED.value: "Error calculating summaries",
+    }
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "message": messages[job.status],
+        "stats": job.get_stats(),
+        "error": job.error
+    }
+
+
+def fail_stale_job(db: Session, job: UploadJob) -> None:
+    """
+    Mark an unfinished job FAILED once it is past UPLOAD_JOB_TIMEOUT
+    
+    process_summaries runs in-process, so a worker restart leaves its job
+    PENDING or PROCESSING for good. The update is conditional on the job
+    still being unfinished, so a job that completes meanwhile is kept.
+    """
+    deadline = datetime.utcnow() - timedelta(seconds=settings.UPLOAD_JOB_TIMEOUT)
+    if job.created_at is None or job.created_at > deadline:
+        return
+    
+    db.query(UploadJob).filter(
+        UploadJob.id == job.id,
+        UploadJob.status.in_(UNFINISHED_STATUSES)
+    ).update({
+        'status': UploadStatus.FAILED.value,
+        'error': "Summary calculation did not finish in time. Please upload the file again.",
+        'completed_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    db.refresh(job)
+
+
+def process_summaries(job_id: int):
+    """
+    Calculate daily and weekly summaries for the logs of an upload job
+    
+    Runs after the upload response is sent, in its own session. The job row
+    records progress, the summary counts, and the error if it fails; the
+    summaries themselves are committed together or not at all.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(UploadJob, job_id)
+        job.status = UploadStatus.PROCESSING.value
         db.commit()
         
+        # The summaries are written in one transaction from here on. They can
+        # be rebuilt from the logs, so Postgres need not wait for the WAL flush.
+        if db.get_bind().dialect.name == 'postgresql':
+            db.execute(text("SET LOCAL synchronous_commit = off"))
+        
+        # Read the upload's logs back in insertion order
+        import pandas as pd
+        log_columns = [
+            AttendanceLog.employee_code, AttendanceLog.date, AttendanceLog.in_time, AttendanceLog.out_time,
+            AttendanceLog.in_minute, AttendanceLog.out_minute, AttendanceLog.total_time, AttendanceLog.remark
+        ]
+        logs = pd.DataFrame.from_records(
+            iter(db.query(*log_columns).filter(AttendanceLog.upload_id == job_id).order_by(AttendanceLog.id).yield_per(5000)),
+            columns=['code', 'date', 'in_time', 'out_time', 'in_minute', 'out_minute', 'total_time', 'remark']
+        )
+        
         # Calculate daily summaries with dynamic settings from database
-        from routers.settings import get_dynamic_settings
+        from routers.settings import get_dynamic_settings, bump_data_version
         dynamic_settings = get_dynamic_settings(db)
         
         calculator = TimeCalculator(
@@ -116,110 +352,59 @@ async def upload_attendance_file(
             threshold_amber=dynamic_settings['threshold_amber']
         )
         
-        daily_summaries = calculator.calculate_daily_summary(records)
-        daily_created = 0
-        
-        for emp_code, date_summaries in daily_summaries.items():
-            for rec_date, summary in date_summaries.items():
-                # Check if already exists
-                existing = db.query(DailyAttendance).filter(
-                    DailyAttendance.employee_code == emp_code,
-                    DailyAttendance.date == rec_date
-                ).first()
-                
-                status_enum = AttendanceStatus[summary['status']]
-                
-                if existing:
-                    # Update existing
-                    existing.total_office_minutes = summary['total_office_minutes']
-                    existing.status = status_enum
-                    existing.in_out_pairs = summary['in_out_pairs']
-                    existing.first_in = summary['first_in']
-                    existing.last_out = summary['last_out']
-                else:
-                    # Create new
-                    daily = DailyAttendance(
-                        employee_code=emp_code,
-                        date=rec_date,
-                        total_office_minutes=summary['total_office_minutes'],
-                        status=status_enum,
-                        in_out_pairs=summary['in_out_pairs'],
-                        first_in=summary['first_in'],
-                        last_out=summary['last_out']
-                    )
-                    db.add(daily)
-                    daily_created += 1
+        daily_summaries = calculator.calculate_daily_summary_df(logs)
         
-        db.commit()
+        # Upsert daily rows; the row count over the uploaded range gives the number created
+        all_dates = logs['date'].unique().tolist()
+        daily_in_range = db.query(func.count(DailyAttendance.id)).filter(
+            DailyAttendance.date.between(min(all_dates), max(all_dates))
+        )
+        daily_before = daily_in_range.scalar()
+        
+        daily_rows = [
+            {
+                'employee_code': emp_code,
+                'date': rec_date,
+                'total_office_minutes': summary['total_office_minutes'],
+                'status': AttendanceStatus[summary['status']].value,
+                'in_out_pairs': summary['in_out_pairs'],
+                'first_in': summary['first_in'],
+                'last_out': summary['last_out']
+            }
+            for emp_code, date_summaries in daily_summaries.items()
+            for rec_date, summary in date_summaries.items()
+        ]
+        upsert_rows(db, DailyAttendance, daily_rows, ['employee_code', 'date'])
+        job.daily_summaries_created = daily_in_range.scalar() - daily_before
         
         # Calculate weekly summaries
-        all_dates = [record['date'] for record in records]
         weeks = calculator.get_all_weeks(all_dates)
-        weekly_created = 0
         
-        # Fetch employee requirements for calculation
-        all_employees = db.query(Employee).all()
-        employee_requirements = {emp.code: emp.required_wfo_days for emp in all_employees}
+        weekly_in_range = db.query(func.count(WeeklySummary.id)).filter(
+            WeeklySummary.week_start.in_([week_start for week_start, _ in weeks])
+        )
+        weekly_before = weekly_in_range.scalar()
         
-        for week_start, week_end in weeks:
-            weekly_data = calculator.calculate_weekly_summary(
-                daily_summaries, week_start, week_end, employee_requirements
-            )
-            
-            for emp_code, week_summary in weekly_data.items():
-                existing = db.query(WeeklySummary).filter(
-                    WeeklySummary.employee_code == emp_code,
-                    WeeklySummary.week_start == week_start
-                ).first()
-                
-                status_enum = ComplianceStatus[week_summary['status']]
-                
-                if existing:
-                    # Update existing
-                    existing.total_office_minutes = week_summary['total_office_minutes']
-                    existing.wfo_days = week_summary['wfo_days']
-                    existing.expected_minutes = week_summary['expected_minutes']
-                    existing.compliance_percentage = week_summary['compliance_percentage']
-                    existing.status = status_enum
-                else:
-                    # Create new
-                    weekly = WeeklySummary(
-                        employee_code=emp_code,
-                        week_start=week_start,
-                        week_end=week_end,
-                        total_office_minutes=week_summary['total_office_minutes'],
-                        wfo_days=week_summary['wfo_days'],
-                        expected_minutes=week_summary['expected_minutes'],
-                        compliance_percentage=week_summary['compliance_percentage'],
-                        status=status_enum
-                    )
-                    db.add(weekly)
-                    weekly_created += 1
+        # Rows come back already shaped for the bulk upsert
+        weekly_rows = calculator.calculate_weekly_summaries(daily_summaries, weeks)
         
-        db.commit()
+        # week_end follows from week_start, so only the figures are updated
+        upsert_rows(db, WeeklySummary, weekly_rows, ['employee_code', 'week_start'], exclude=['week_end'])
+        job.weekly_summaries_created = weekly_in_range.scalar() - weekly_before
         
-        return {
-            "success": True,
-            "message": "File processed successfully",
-            "stats": {
-                "records_parsed": len(records),
-                "employees_created": employees_created,
-                "attendance_logs_created": logs_created,
-                "daily_summaries_created": daily_created,
-                "weekly_summaries_created": weekly_created
-            },
-            "warnings": parser.warnings[:10] if parser.warnings else [],
-            "errors": parser.errors[:10] if parser.errors else []
-        }
+        job.status = UploadStatus.COMPLETED.value
+        job.completed_at = datetime.utcnow()
+        bump_data_version(db)
+        db.commit()
     
-    except HTTPException:
-        raise
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback
-        with open("upload_debug.log", "a") as f:
-            f.write(f"Error processing upload: {str(e)}\n")
-            traceback.print_exc(file=f)
-        logger.exception("Error processing upload")
-        raise HTTPException(status_code=500, detail=f"Error processing file ({type(e).__name__}): {str(e)}")
+        logger.exception("Error calculating summaries for upload %s", job_id)
+        db.rollback()
+        db.query(UploadJob).filter(UploadJob.id == job_id).update({
+            'status': UploadStatus.FAILED.value,
+            'error': f"{type(e).__name__}: {str(e)}",
+            'completed_at': datetime.utcnow()
+        })
+        db.commit()
+    finally:
+        db.close()
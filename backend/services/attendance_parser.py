@@ -3,45 +3,109 @@ Attendance Parser Service
 Handles parsing of biometric attendance data from CSV/Excel files
 """
 import pandas as pd
+import numpy as np
 from datetime import datetime, date, time
-from typing import List, Dict, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from io import BytesIO
+import codecs
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+try:
+    import pyarrow  # noqa: F401 - enables pandas' pyarrow CSV engine
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Byte order marks that select the CSV encoding (both readers already skip a UTF-8 BOM)
+CSV_BOMS = {
+    codecs.BOM_UTF16_LE: 'utf-16',
+    codecs.BOM_UTF16_BE: 'utf-16',
+}
+
+# Cell values read as missing, matching pandas' read_excel defaults plus Excel error values
+EXCEL_NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+    '#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!',
+])
+
+# Accepted date formats, tried in order
+DATE_FORMATS = (
+    '%d/%m/%Y',  # DD/MM/YYYY
+    '%Y-%m-%d',  # YYYY-MM-DD
+    '%m/%d/%Y',  # MM/DD/YYYY
+    '%d-%m-%Y',  # DD-MM-YYYY
+    '%Y-%m-%d %H:%M:%S', # Pandas default string for datetime
+    '%d-%b-%Y',  # 01-Dec-2025
+    '%d/%m/%y',  # DD/MM/YY
+)
+
+# Accepted time formats, tried in order
+TIME_FORMATS = (
+    '%H:%M',      # HH:MM
+    '%H:%M:%S',   # HH:MM:SS
+    '%I:%M %p',   # 12-hour with AM/PM
+    '%I:%M:%S %p',
+)
+
+# TIME_FORMATS as regexes, using strptime's own ranges for %H, %I, %M and %S
+TIME_24H_RE = re.compile(r'(2[0-3]|[0-1]\d|\d):([0-5]\d|\d)(?::(6[0-1]|[0-5]\d|\d))?')
+TIME_12H_RE = re.compile(r'(1[0-2]|0[1-9]|[1-9]):([0-5]\d|\d)(?::(6[0-1]|[0-5]\d|\d))?\s+(am|pm)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def _strptime(value_str: str, formats: Tuple[str, ...]) -> Optional[datetime]:
+    """Parse with the first matching format; cached so repeated bad values fail fast"""
+    for fmt in formats:
+        try:
+            return datetime.strptime(value_str, fmt)
+        except ValueError:
+            continue
+    return None
+
 
 class AttendanceParser:
     """Parse and validate biometric attendance data"""
     
-    # Expected column mappings (case-insensitive)
+    # Expected column mappings (matched case-insensitively)
     COLUMN_MAPPINGS = {
-        'date': ['date', 'DATE', 'Date'],
-        'code': ['code', 'CODE', 'Code', 'employee_code', 'emp_code', 'id'],
-        'name': ['name', 'NAME', 'Name', 'employee_name', 'emp_name'],
-        'in_time': ['in', 'IN', 'In', 'in_time', 'clock_in', 'punch_in'],
-        'out_time': ['out', 'OUT', 'Out', 'out_time', 'clock_out', 'punch_out'],
-        'total': ['total', 'TOTAL', 'Total', 'total_time', 'hours'],
-        'shift': ['shift', 'SHIFT', 'Shift'],
-        'late': ['late', 'LATE', 'Late'],
-        'ot': ['ot', 'OT', 'overtime', 'OVERTIME'],
-        'remark': ['remark', 'REMARK', 'Remark', 'remarks', 'status']
+        'date': ['date', 'attendance date'],
+        'code': ['code', 'employee_code', 'employee code', 'emp_code', 'emp code', 'id'],
+        'name': ['name', 'employee_name', 'emp_name'],
+        'in_time': ['in', 'in_time', 'clock_in', 'punch_in'],
+        'out_time': ['out', 'out_time', 'clock_out', 'punch_out'],
+        'total': ['total', 'total_time', 'hours'],
+        'shift': ['shift'],
+        'late': ['late'],
+        'ot': ['ot', 'overtime'],
+        'remark': ['remark', 'remarks', 'status']
+    }
+    
+    # Lowercase column name -> standard name
+    COLUMN_ALIASES = {
+        variation: standard_name
+        for standard_name, variations in COLUMN_MAPPINGS.items()
+        for variation in variations
     }
     
     def __init__(self):
         self.errors: List[str] = []
         self.warnings: List[str] = []
     
-    def parse_file(self, file_content: bytes, filename: str) -> Tuple[pd.DataFrame, List[Dict]]:
+    def parse_file(self, file_content: Union[bytes, str], filename: str) -> pd.DataFrame:
         """
         Parse uploaded file (CSV or Excel) into structured attendance data
         
         Args:
-            file_content: Raw file bytes
+            file_content: Raw file bytes, or the path of a file on disk
             filename: Original filename for format detection
         
         Returns:
-            Tuple of (DataFrame, list of parsed records)
+            DataFrame of the parsed columns, one row per valid record
         """
         self.errors = []
         self.warnings = []
@@ -58,25 +122,94 @@ class AttendanceParser:
         df = self._normalize_columns(df)
         
         # Parse and validate data
-        records = self._parse_records(df)
+        columns = self._parse_columns(df)
         
-        return df, records
+        return pd.DataFrame(columns, dtype=object)
     
-    def _parse_csv(self, content: bytes) -> pd.DataFrame:
+    def _parse_csv(self, content: Union[bytes, str]) -> pd.DataFrame:
         """Parse CSV file"""
+        encoding = self._detect_bom_encoding(content)
+        
+        # Without a byte order mark, try UTF-8 and fall back to Latin-1
+        # (which accepts any bytes)
+        encodings = [encoding] if encoding else ['utf-8', 'latin-1']
+        
+        if HAS_PYARROW and encoding is None:
+            # pyarrow's multithreaded reader handles the common UTF-8 case;
+            # anything it rejects falls through to the C engine below
+            try:
+                df = pd.read_csv(self._source(content), engine='pyarrow')
+            except ValueError as e:
+                # pyarrow.ArrowInvalid, pandas' ParserError and UnicodeDecodeError
+                # (undecodable header) all derive from ValueError
+                logger.debug("pyarrow could not read CSV, using the C engine: %s", e)
+            else:
+                if not self._has_binary_columns(df):
+                    # pyarrow reports missing text as None; use NaN like the C engine
+                    return df.fillna(np.nan)
+                # The file is known not to be UTF-8, so go straight to Latin-1
+                encodings = ['latin-1']
+        
         try:
-            # Try different encodings
-            for encoding in ['utf-8', 'latin-1', 'cp1252']:
+            for encoding in encodings:
                 try:
-                    return pd.read_csv(BytesIO(content), encoding=encoding)
+                    return pd.read_csv(
+                        self._source(content),
+                        encoding=encoding,
+                        memory_map=isinstance(content, str)
+                    )
                 except UnicodeDecodeError:
                     continue
             raise ValueError("Could not decode CSV file")
         except Exception as e:
             raise ValueError(f"Error parsing CSV: {str(e)}")
     
-    def _parse_excel(self, content: bytes) -> pd.DataFrame:
-        """Parse Excel file with robust header detection"""
+    def _detect_bom_encoding(self, content: Union[bytes, str]) -> Optional[str]:
+        """Encoding named by a UTF-16 byte order mark, or None without one"""
+        if isinstance(content, bytes):
+            prefix = content[:2]
+        else:
+            with open(content, 'rb') as f:
+                prefix = f.read(2)
+        
+        for bom, encoding in CSV_BOMS.items():
+            if prefix.startswith(bom):
+                return encoding
+        
+        return None
+    
+    @staticmethod
+    def _source(content: Union[bytes, str]):
+        """Input for pandas/openpyxl: a file path as is, raw bytes wrapped in a buffer"""
+        return BytesIO(content) if isinstance(content, bytes) else content
+    
+    @staticmethod
+    def _has_binary_columns(df: pd.DataFrame) -> bool:
+        """
+        Whether pyarrow read any column as raw bytes
+        
+        pyarrow does not raise on text that isn't valid UTF-8; it types the
+        whole column as binary instead, so checking one value per column
+        tells whether the file needs another encoding.
+        """
+        for position, dtype in enumerate(df.dtypes):
+            if dtype != object:
+                continue
+            column = df.iloc[:, position]
+            first = column.first_valid_index()
+            if first is not None and isinstance(column[first], bytes):
+                return True
+        return False
+    
+    def _parse_excel(self, content: Union[bytes, str]) -> pd.DataFrame:
+        """
+        Parse Excel file with robust header detection
+        
+        The workbook is read once in openpyxl's read-only mode: the first rows
+        are probed for the header and the rest of the same row stream becomes
+        the DataFrame. Cells keep their native types (datetime, time, int);
+        the column parsers handle those as well as text.
+        """
         import warnings
         
         try:
@@ -84,115 +217,188 @@ class AttendanceParser:
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
                 
-                # First pass: try to find the header row
-                # Read first few rows without header
-                df_preview = pd.read_excel(BytesIO(content), header=None, nrows=10, dtype=str)
-                
-                header_row_idx = 0
-                found_header = False
-                
-                # Check each row for expected column names
-                for idx, row in df_preview.iterrows():
-                    row_values = [str(val).strip().lower() for val in row.values if pd.notna(val)]
-                    # Check for critical columns
-                    has_date = any(col in row_values for col in ['date', 'attendance date'])
-                    has_code = any(col in row_values for col in ['code', 'employee code', 'emp code', 'id'])
-                    
-                    if has_date and has_code:
-                        header_row_idx = idx
-                        found_header = True
-                        break
-                
-                # Second pass: read full file with correct header
                 try:
-                    df = pd.read_excel(
-                        BytesIO(content),
-                        header=header_row_idx,
-                        dtype=str,
-                        na_values=['', 'NA', 'N/A', 'null', 'NULL']
-                    )
+                    from openpyxl import load_workbook
+                    wb = load_workbook(self._source(content), read_only=True, data_only=True)
                 except Exception:
-                     # Fallback to default
-                    df = pd.read_excel(BytesIO(content), header=header_row_idx)
-
-                return df
+                    # Not an .xlsx workbook (e.g. legacy .xls): let pandas pick the engine
+                    sheet = pd.read_excel(self._source(content), header=None, dtype=object)
+                    return self._frame_from_rows(sheet.itertuples(index=False, name=None))
+                
+                try:
+                    ws = wb.active
+                    ws.reset_dimensions()
+                    return self._frame_from_rows(ws.iter_rows(values_only=True))
+                finally:
+                    wb.close()
                 
         except Exception as e:
             raise ValueError(f"Error parsing Excel: {str(e)}")
     
+    def _frame_from_rows(self, rows: Iterator[tuple]) -> pd.DataFrame:
+        """Build a DataFrame from sheet rows, using the detected header row"""
+        sheet = pd.DataFrame(list(rows), dtype=object)
+        
+        # Empty cells, error cells and NA markers are treated as missing
+        missing = sheet.isna() | sheet.isin(EXCEL_NA_VALUES)
+        sheet = sheet.mask(missing)
+        
+        # Drop trailing empty rows and columns
+        filled_rows = np.flatnonzero(~missing.all(axis=1))
+        if not len(filled_rows):
+            return pd.DataFrame()
+        filled_cols = np.flatnonzero(~missing.all(axis=0))
+        sheet = sheet.iloc[:filled_rows[-1] + 1, :filled_cols[-1] + 1]
+        
+        # Check the first rows for expected column names, else use the first row
+        header_row_idx = next(
+            (idx for idx, row in enumerate(sheet.head(10).itertuples(index=False, name=None))
+             if self._is_header_row(row)),
+            0
+        )
+        data = sheet.iloc[header_row_idx + 1:].reset_index(drop=True)
+        data.columns = self._column_names(sheet.iloc[header_row_idx].tolist())
+        return data
+    
+    def _is_header_row(self, row: tuple) -> bool:
+        """Check a sheet row for the critical date and employee code columns"""
+        row_values = [str(val).strip().lower() for val in row if pd.notna(val)]
+        has_date = any(col in row_values for col in ['date', 'attendance date'])
+        has_code = any(col in row_values for col in ['code', 'employee code', 'emp code', 'id'])
+        return has_date and has_code
+    
+    def _column_names(self, row: List) -> List[str]:
+        """Header cells as unique column names, like pandas' read_excel"""
+        names = []
+        seen: Dict[str, int] = {}
+        for i, value in enumerate(row):
+            name = f"Unnamed: {i}" if pd.isna(value) else str(value)
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            names.append(name)
+        return names
+    
     def _normalize_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Normalize column names to standard format"""
+        """Normalize column names to standard format (first matching column wins)"""
         column_map = {}
         
-        for standard_name, variations in self.COLUMN_MAPPINGS.items():
-            for col in df.columns:
-                if col.strip() in variations:
-                    column_map[col] = standard_name
-                    break
+        for col in df.columns:
+            standard_name = self.COLUMN_ALIASES.get(str(col).strip().lower())
+            if standard_name and standard_name not in column_map.values():
+                column_map[col] = standard_name
         
         df = df.rename(columns=column_map)
         return df
     
-    def _parse_records(self, df: pd.DataFrame) -> List[Dict]:
-        """Parse DataFrame rows into attendance records"""
-        records = []
+    def _parse_columns(self, df: pd.DataFrame) -> Dict[str, List]:
+        """
+        Parse DataFrame columns into attendance record fields
         
-        for idx, row in df.iterrows():
-            try:
-                record = self._parse_row(row, idx)
-                if record:
-                    records.append(record)
-            except Exception as e:
-                self.errors.append(f"Row {idx + 2}: {str(e)}")
+        Works column-wise: dates and times are parsed once per distinct value
+        and numeric columns are converted in bulk, instead of per row.
+        """
+        dates = self._parse_date_column(self._column(df, 'date'))
+        codes = self._parse_str_column(self._column(df, 'code', ''))
         
-        return records
-    
-    def _parse_row(self, row: pd.Series, idx: int) -> Optional[Dict]:
-        """Parse a single row into an attendance record"""
-        # Parse date
-        date_val = self._parse_date(row.get('date'))
-        if not date_val:
-            with open("upload_debug.log", "a") as f:
-                f.write(f"Row {idx + 2}: Date parse failed for value '{row.get('date')}' (type: {type(row.get('date'))})\n")
-            self.warnings.append(f"Row {idx + 2}: Invalid or missing date")
-            return None
+        # Report rows without a date or employee code, in row order
+        valid_date = dates.notna()
+        valid = valid_date & (codes != '')
+        invalid_dates = []
+        for idx in df.index[~valid]:
+            if not valid_date[idx]:
+                invalid_dates.append(idx)
+                self.warnings.append(f"Row {idx + 2}: Invalid or missing date")
+            else:
+                self.warnings.append(f"Row {idx + 2}: Missing employee code")
         
-        # Parse employee code
-        code = str(row.get('code', '')).strip()
-        if not code or code == 'nan':
-            self.warnings.append(f"Row {idx + 2}: Missing employee code")
-            return None
+        if invalid_dates and logger.isEnabledFor(logging.DEBUG):
+            raw_dates = self._column(df, 'date')
+            logger.debug("Date parse failed for %d rows:\n%s", len(invalid_dates), "\n".join(
+                f"Row {idx + 2}: value '{raw_dates[idx]}' (type: {type(raw_dates[idx])})"
+                for idx in invalid_dates
+            ))
+        
+        df = df[valid]
         
-        # Parse name
-        name = str(row.get('name', '')).strip()
-        if name == 'nan':
-            name = ''
-        
-        # Parse times
-        in_time = self._parse_time(row.get('in_time'))
-        out_time = self._parse_time(row.get('out_time'))
-        total_time = self._parse_time(row.get('total'))
-        
-        # Parse other fields
-        shift = self._parse_int(row.get('shift'))
-        late = self._parse_int(row.get('late'))
-        ot = self._parse_int(row.get('ot'))
-        remark = str(row.get('remark', '')).strip()
-        if remark == 'nan':
-            remark = ''
-        
-        return {
-            'date': date_val,
-            'code': code,
-            'name': name,
-            'in_time': in_time,
-            'out_time': out_time,
-            'total_time': total_time,
-            'shift': shift,
-            'late_minutes': late,
-            'overtime_minutes': ot,
-            'remark': remark
+        in_times = self._to_list(self._parse_time_column(self._column(df, 'in_time')))
+        out_times = self._to_list(self._parse_time_column(self._column(df, 'out_time')))
+        
+        columns = {
+            'date': self._to_list(dates[valid]),
+            'code': codes[valid].tolist(),
+            'name': self._parse_str_column(self._column(df, 'name', '')).tolist(),
+            'in_time': in_times,
+            'out_time': out_times,
+            'in_minute': [self._minute_of_day(t) for t in in_times],
+            'out_minute': [self._minute_of_day(t) for t in out_times],
+            'total_time': self._to_list(self._parse_time_column(self._column(df, 'total'))),
+            'shift': self._parse_int_column(self._column(df, 'shift')),
+            'late_minutes': self._parse_int_column(self._column(df, 'late')),
+            'overtime_minutes': self._parse_int_column(self._column(df, 'ot')),
+            'remark': self._parse_str_column(self._column(df, 'remark', '')).tolist()
         }
+        return columns
+    
+    def _column(self, df: pd.DataFrame, name: str, default=None) -> pd.Series:
+        """Get a normalized column, or a column of default values if it is missing"""
+        if name in df.columns:
+            return df[name]
+        return pd.Series(default, index=df.index, dtype=object)
+    
+    def _to_list(self, series: pd.Series) -> List:
+        """Convert a column to a Python list with None for missing values"""
+        return series.astype(object).where(series.notna(), None).tolist()
+    
+    def _parse_str_column(self, series: pd.Series) -> pd.Series:
+        """Strip a text column, treating 'nan' as empty"""
+        cleaned = series.astype(str).str.strip()
+        return cleaned.mask(cleaned == 'nan', '')
+    
+    def _parse_int_column(self, series: pd.Series) -> List[int]:
+        """Parse an integer column, using 0 for missing or invalid values"""
+        numbers = pd.to_numeric(series, errors='coerce').fillna(0)
+        return np.trunc(numbers).astype('int64').tolist()
+    
+    def _parse_date_column(self, series: pd.Series) -> pd.Series:
+        """Parse a date column into date objects (None where invalid)"""
+        return self._parse_formatted_column(series, DATE_FORMATS, self._parse_date, 'date')
+    
+    def _parse_time_column(self, series: pd.Series) -> pd.Series:
+        """Parse a time column into time objects (None where invalid)"""
+        return self._parse_formatted_column(series, TIME_FORMATS, self._parse_time, 'time')
+    
+    def _parse_formatted_column(self, series: pd.Series, formats: Tuple[str, ...], parse, part: str) -> pd.Series:
+        """
+        Parse the distinct values of a date/time column
+        
+        Text values get one vectorized pd.to_datetime pass per format, in the
+        same order the scalar parser tries them; each pass only sees the
+        values no earlier format matched. Whatever is left (native Excel
+        values, numbers, strings pandas cannot represent) goes through the
+        scalar parser. `part` is the datetime accessor to keep ('date' or 'time').
+        """
+        values = series.dropna().unique()
+        parsed = {}
+        
+        text = pd.Series([v for v in values if isinstance(v, str)], dtype=object)
+        remaining = text.str.strip()
+        # pandas rolls leap seconds (:60, :61) over where strptime rejects them
+        remaining = remaining[~remaining.str.contains(r':6[01](?!\d)')]
+        for fmt in formats:
+            if remaining.empty:
+                break
+            result = pd.to_datetime(remaining, format=fmt, errors='coerce', cache=True)
+            matched = result.notna()
+            parsed.update(zip(text[matched[matched].index], getattr(result[matched].dt, part)))
+            remaining = remaining[~matched]
+        
+        for value in values:
+            if value not in parsed:
+                parsed[value] = parse(value)
+        return series.map(parsed)
     
     def _parse_date(self, value) -> Optional[date]:
         """Parse date from various formats"""
@@ -205,26 +411,8 @@ class AttendanceParser:
         if isinstance(value, date):
             return value
         
-        # Try common date formats
-        date_formats = [
-            '%d/%m/%Y',  # DD/MM/YYYY
-            '%Y-%m-%d',  # YYYY-MM-DD
-            '%m/%d/%Y',  # MM/DD/YYYY
-            '%d-%m-%Y',  # DD-MM-YYYY
-            '%Y-%m-%d %H:%M:%S', # Pandas default string for datetime
-            '%d-%b-%Y',  # 01-Dec-2025
-            '%d/%m/%y',  # DD/MM/YY
-        ]
-        
-        value_str = str(value).strip()
-        
-        for fmt in date_formats:
-            try:
-                return datetime.strptime(value_str, fmt).date()
-            except ValueError:
-                continue
-        
-        return None
+        parsed = _strptime(str(value).strip(), DATE_FORMATS)
+        return parsed.date() if parsed else None
     
     def _parse_time(self, value) -> Optional[time]:
         """Parse time from various formats"""
@@ -241,44 +429,36 @@ class AttendanceParser:
         if not value_str or value_str == 'nan':
             return None
         
-        # Try common time formats
-        time_formats = [
-            '%H:%M',      # HH:MM
-            '%H:%M:%S',   # HH:MM:SS
-            '%I:%M %p',   # 12-hour with AM/PM
-            '%I:%M:%S %p',
-        ]
-        
-        for fmt in time_formats:
-            try:
-                return datetime.strptime(value_str, fmt).time()
-            except ValueError:
-                continue
+        match = TIME_24H_RE.fullmatch(value_str)
+        if match:
+            hour = int(match[1])
+        else:
+            match = TIME_12H_RE.fullmatch(value_str)
+            if not match:
+                return None
+            hour = int(match[1]) % 12 + (12 if match[4].lower() == 'pm' else 0)
         
-        return None
+        # strptime accepts leap seconds 60 and 61 but time() rejects them
+        second = int(match[3] or 0)
+        if second > 59:
+            return None
+        return time(hour, int(match[2]), second)
     
-    def _parse_int(self, value) -> int:
-        """Parse integer value"""
-        if pd.isna(value):
-            return 0
-        try:
-            return int(float(value))
-        except (ValueError, TypeError):
-            return 0
+    def _minute_of_day(self, t: Optional[time]) -> Optional[int]:
+        """Convert time to minutes since midnight"""
+        if t is None:
+            return None
+        return t.hour * 60 + t.minute
     
-    def get_unique_employees(self, records: List[Dict]) -> List[Dict]:
-        """Extract unique employees from records"""
-        employees = {}
-        
-        for record in records:
-            code = record['code']
-            if code not in employees:
-                employees[code] = {
-                    'code': code,
-                    'name': record['name']
-                }
-            elif not employees[code]['name'] and record['name']:
-                # Update name if previously empty
-                employees[code]['name'] = record['name']
-        
-        return list(employees.values())
+    def get_unique_employees_df(self, df: pd.DataFrame) -> List[Dict]:
+        """
+        Extract unique employees from the parsed DataFrame
+        
+        Employees are listed in order of first appearance, each with the
+        first non-empty name seen for its code.
+        """
+        employees = df[['code', 'name']]
+        codes = employees.drop_duplicates('code')[['code']]
+        names = employees[employees['name'] != ''].drop_duplicates('code')
+        unique = codes.merge(names, on='code', how='left').fillna({'name': ''})
+        return unique.to_dict('records')
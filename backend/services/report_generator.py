@@ -3,55 +3,171 @@ Report Generator Service
 Generates various attendance reports for HR dashboard
 """
 from datetime import date, datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterator
+from collections import OrderedDict
+from functools import lru_cache, wraps
+import threading
+import time
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-import json
+from sqlalchemy import func, and_, select, case, cast, literal, union_all, Date, Float
 
 from models.employee import Employee
 from models.attendance import AttendanceLog, DailyAttendance, WeeklySummary, AttendanceStatus, ComplianceStatus
 from config import settings, get_status_color
 
 
+# Statements built once at import so SQLAlchemy can reuse their compiled form
+STMT_EMPLOYEE_COUNT = select(func.count(Employee.id))
+
+STMT_AVAILABLE_WEEKS = select(
+    WeeklySummary.week_start,
+    WeeklySummary.week_end
+).distinct().order_by(WeeklySummary.week_start.desc())
+
+# Sort rank of each compliance status (higher is better)
+STATUS_ORDER = {'GREEN': 3, 'AMBER': 2, 'RED': 1}
+
+# ORDER BY expressions for the all employees report's sort_by values;
+# employees without a summary sort as 0% / RED
+EMPLOYEE_REPORT_SORT_COLUMNS = {
+    'name': Employee.name,
+    'compliance': func.coalesce(WeeklySummary.compliance_percentage, 0),
+    'hours': func.coalesce(WeeklySummary.total_office_minutes, 0),
+    'status': case(STATUS_ORDER, value=func.coalesce(WeeklySummary.status, 'RED'), else_=0),
+}
+
+# Columns formatted by the all employees report; summary_id is NULL without a summary
+EMPLOYEE_REPORT_COLUMNS = (
+    Employee.code,
+    Employee.name,
+    Employee.department,
+    Employee.required_wfo_days,
+    WeeklySummary.id.label('summary_id'),
+    WeeklySummary.total_office_minutes,
+    WeeklySummary.wfo_days,
+    WeeklySummary.expected_minutes,
+    WeeklySummary.compliance_percentage,
+    WeeklySummary.status,
+    WeeklySummary.week_start,
+    WeeklySummary.week_end,
+)
+
+# Process-level cache of report results (see cached_report)
+_report_cache: OrderedDict = OrderedDict()
+_report_cache_lock = threading.Lock()
+
+
+def cached_report(method):
+    """
+    Cache a report method's result per arguments and data version
+    
+    Every upload, employee edit and settings change bumps the data version,
+    so a cached result is never served after the data behind it changed.
+    Entries also expire after REPORT_CACHE_TTL seconds, and only the
+    REPORT_CACHE_SIZE most recently used are kept. Cached results are
+    shared between requests and must not be mutated by callers. The version
+    read for the key is kept on self.data_version for settings lookups.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        from routers.settings import get_data_version
+        self.data_version = get_data_version(self.db)
+        key = (method.__name__, args, tuple(sorted(kwargs.items())), self.data_version)
+        now = time.monotonic()
+        
+        with _report_cache_lock:
+            entry = _report_cache.get(key)
+            if entry is not None and now < entry[0]:
+                _report_cache.move_to_end(key)
+                return entry[1]
+        
+        result = method(self, *args, **kwargs)
+        
+        with _report_cache_lock:
+            _report_cache[key] = (now + settings.REPORT_CACHE_TTL, result)
+            _report_cache.move_to_end(key)
+            while len(_report_cache) > settings.REPORT_CACHE_SIZE:
+                _report_cache.popitem(last=False)
+        return result
+    
+    return wrapper
+
+
+# Report rows repeat the same minute totals, so formatting is cached
+@lru_cache(maxsize=4096, typed=True)
+def format_minutes(minutes: int) -> str:
+    """Format minutes as human-readable string"""
+    if not minutes:
+        return '0h 0m'
+    hours = minutes // 60
+    mins = minutes % 60
+    return f"{hours}h {mins}m"
+
+
+@lru_cache(maxsize=1024)
+def format_week_label(week_start: date, week_end: date) -> str:
+    """Format a week as e.g. '01 Dec - 07 Dec 2025' (cached; every report repeats the same weeks)"""
+    return f"{week_start.strftime('%d %b')} - {week_end.strftime('%d %b %Y')}"
+
+
 class ReportGenerator:
     """Generate attendance reports"""
     
     def __init__(self, db: Session):
         self.db = db
+        self.data_version: Optional[str] = None  # Set by cached_report
+        self._dynamic_settings = None
+    
+    @property
+    def dynamic_settings(self) -> Dict:
+        """Dynamic settings, resolved once per generator"""
+        if self._dynamic_settings is None:
+            from routers.settings import get_dynamic_settings
+            self._dynamic_settings = get_dynamic_settings(self.db, self.data_version)
+        return self._dynamic_settings
     
+    @cached_report
     def get_dashboard_summary(self) -> Dict:
         """Get summary statistics for dashboard"""
         # Total employees
-        total_employees = self.db.query(Employee).count()
+        total_employees = self.db.execute(STMT_EMPLOYEE_COUNT).scalar()
         
-        # Get latest week's data
-        latest_summary = self.db.query(WeeklySummary).order_by(
+        # Get latest week
+        latest_week = self.db.query(
+            WeeklySummary.week_start,
+            WeeklySummary.week_end
+        ).order_by(
             WeeklySummary.week_start.desc()
         ).first()
         
-        if latest_summary:
-            week_start = latest_summary.week_start
-            week_end = latest_summary.week_end
+        if latest_week:
+            week_start, week_end = latest_week
             
-            # Get all summaries for this week
-            weekly_summaries = self.db.query(WeeklySummary).filter(
+            # Count, compliance and WFO day totals per status in one grouped query
+            status_rows = self.db.query(
+                WeeklySummary.status,
+                func.count(WeeklySummary.id),
+                func.sum(WeeklySummary.compliance_percentage),
+                func.sum(WeeklySummary.wfo_days)
+            ).filter(
                 WeeklySummary.week_start == week_start
-            ).all()
-            
-            # Calculate averages
-            total_compliance = sum(s.compliance_percentage for s in weekly_summaries)
-            avg_compliance = total_compliance / len(weekly_summaries) if weekly_summaries else 0
+            ).group_by(WeeklySummary.status).all()
             
-            # Count by status
             status_counts = {
                 'RED': 0,
                 'AMBER': 0,
                 'GREEN': 0
             }
-            for s in weekly_summaries:
-                status_counts[s.status.value] += 1
+            total_compliance = 0
+            total_wfo_days = 0
+            for status, count, compliance, wfo_days in status_rows:
+                status_counts[status] += count
+                total_compliance += compliance or 0
+                total_wfo_days += wfo_days or 0
             
-            total_wfo_days = sum(s.wfo_days for s in weekly_summaries)
+            # Calculate averages
+            total_summaries = sum(status_counts.values())
+            avg_compliance = total_compliance / total_summaries if total_summaries else 0
         else:
             week_start = None
             week_end = None
@@ -64,8 +180,8 @@ class ReportGenerator:
             'avg_compliance': round(avg_compliance, 2),
             'status_distribution': status_counts,
             'total_wfo_days': total_wfo_days,
-            'week_start': week_start.isoformat() if week_start else None,
-            'week_end': week_end.isoformat() if week_end else None,
+            'week_start': week_start,
+            'week_end': week_end,
             'alerts': status_counts.get('RED', 0)
         }
     
@@ -74,7 +190,9 @@ class ReportGenerator:
         week_start: Optional[date] = None,
         sort_by: str = 'name',
         sort_order: str = 'asc',
-        status_filter: Optional[str] = None
+        status_filter: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
     ) -> List[Dict]:
         """
         Generate report for all employees
@@ -84,74 +202,91 @@ class ReportGenerator:
             sort_by: Column to sort by
             sort_order: 'asc' or 'desc'
             status_filter: Filter by status ('RED', 'AMBER', 'GREEN')
+            limit: Maximum number of employees to return (optional)
+            offset: Number of sorted employees to skip
         
         Returns:
             List of employee reports
         """
+        query = self._all_employees_query(week_start, status_filter)
+        
+        # Sort in the database
+        sort_column = EMPLOYEE_REPORT_SORT_COLUMNS.get(sort_by)
+        if sort_column is not None:
+            query = query.order_by(sort_column.desc() if sort_order.lower() == 'desc' else sort_column)
+        
+        # Ties keep employee order
+        query = query.order_by(Employee.id)
+        
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        
+        return [self._format_employee_report(row) for row in query.all()]
+    
+    def iter_all_employees_report(
+        self,
+        week_start: Optional[date] = None,
+        status_filter: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        Yield employee reports one at a time, ordered by name
+        
+        Same rows as get_all_employees_report with the default sort, but
+        without materializing the full list (used by CSV export).
+        """
+        query = self._all_employees_query(week_start, status_filter).order_by(
+            Employee.name, Employee.id
+        )
+        for row in query.yield_per(500):
+            yield self._format_employee_report(row)
+    
+    def _all_employees_query(
+        self,
+        week_start: Optional[date],
+        status_filter: Optional[str]
+    ):
+        """Build the Employee/WeeklySummary query for the all employees report"""
+        if not week_start:
+            # Get latest week
+            week_start = self.db.query(func.max(WeeklySummary.week_start)).scalar()
+        
         if week_start:
-            # Filter by specific week in the JOIN condition to keep all employees
+            # Filter by the week in the JOIN condition to keep all employees
             # (Outer join with condition ensures employees without data for this week are still returned)
-            query = self.db.query(Employee, WeeklySummary).outerjoin(
-                WeeklySummary,
-                and_(
-                    WeeklySummary.employee_code == Employee.code,
-                    WeeklySummary.week_start == week_start
-                )
+            on_clause = and_(
+                WeeklySummary.employee_code == Employee.code,
+                WeeklySummary.week_start == week_start
             )
         else:
-            # Get latest week
-            latest = self.db.query(func.max(WeeklySummary.week_start)).scalar()
-            if latest:
-                query = self.db.query(Employee, WeeklySummary).outerjoin(
-                    WeeklySummary,
-                    and_(
-                        WeeklySummary.employee_code == Employee.code,
-                        WeeklySummary.week_start == latest
-                    )
-                )
-            else:
-                # No data at all, just return employees
-                query = self.db.query(Employee, WeeklySummary).outerjoin(
-                    WeeklySummary,
-                    Employee.code == WeeklySummary.employee_code
-                )
+            # No data at all, just return employees
+            on_clause = Employee.code == WeeklySummary.employee_code
+        
+        query = self.db.query(*EMPLOYEE_REPORT_COLUMNS).outerjoin(WeeklySummary, on_clause)
         
         if status_filter:
             query = query.filter(WeeklySummary.status == status_filter)
         
-        results = query.all()
-        
-        reports = []
-        for emp, summary in results:
-            report = {
-                'employee_code': emp.code,
-                'employee_name': emp.name,
-                'department': emp.department,
-                'total_office_hours': self._format_minutes(summary.total_office_minutes) if summary else '0h 0m',
-                'total_office_minutes': summary.total_office_minutes if summary else 0,
-                'wfo_days': summary.wfo_days if summary else 0,
-                'required_wfo_days': emp.required_wfo_days,
-                'expected_hours': self._format_minutes(summary.expected_minutes) if summary else self._format_minutes(settings.expected_weekly_minutes),
-                'compliance_percentage': summary.compliance_percentage if summary else 0,
-                'status': summary.status.value if summary else 'RED',
-                'week_start': summary.week_start.isoformat() if summary else None,
-                'week_end': summary.week_end.isoformat() if summary else None
-            }
-            reports.append(report)
-        
-        # Sort results
-        reverse = sort_order.lower() == 'desc'
-        if sort_by == 'name':
-            reports.sort(key=lambda x: x['employee_name'], reverse=reverse)
-        elif sort_by == 'compliance':
-            reports.sort(key=lambda x: x['compliance_percentage'], reverse=reverse)
-        elif sort_by == 'hours':
-            reports.sort(key=lambda x: x['total_office_minutes'], reverse=reverse)
-        elif sort_by == 'status':
-            status_order = {'GREEN': 3, 'AMBER': 2, 'RED': 1}
-            reports.sort(key=lambda x: status_order.get(x['status'], 0), reverse=reverse)
-        
-        return reports
+        return query
+    
+    def _format_employee_report(self, row) -> Dict:
+        """Format an employee and their weekly summary (EMPLOYEE_REPORT_COLUMNS) as a report row"""
+        summary = row.summary_id is not None
+        return {
+            'employee_code': row.code,
+            'employee_name': row.name,
+            'department': row.department,
+            'total_office_hours': format_minutes(row.total_office_minutes) if summary else '0h 0m',
+            'total_office_minutes': row.total_office_minutes if summary else 0,
+            'wfo_days': row.wfo_days if summary else 0,
+            'required_wfo_days': row.required_wfo_days,
+            'expected_hours': format_minutes(row.expected_minutes) if summary else format_minutes(settings.expected_weekly_minutes),
+            'compliance_percentage': row.compliance_percentage if summary else 0,
+            'status': row.status if summary else 'RED',
+            'week_start': row.week_start,
+            'week_end': row.week_end
+        }
     
     def get_individual_report(
         self, 
@@ -170,92 +305,99 @@ class ReportGenerator:
         Returns:
             Detailed employee report
         """
-        # Get employee
-        employee = self.db.query(Employee).filter(
-            Employee.code == employee_code
-        ).first()
+        # Get dynamic settings for expected hours
+        dynamic_settings = self.dynamic_settings
+        expected_daily_minutes = dynamic_settings['expected_hours_per_day'] * 60
         
-        if not employee:
-            return None
+        # Daily compliance percentage and its status color, computed in SQL.
+        # Float division keeps results identical to Python's on every dialect.
+        if expected_daily_minutes > 0:
+            daily_compliance = cast(DailyAttendance.total_office_minutes, Float) / float(expected_daily_minutes) * 100
+        else:
+            daily_compliance = literal(0)
+        daily_status_color = case(
+            (daily_compliance > dynamic_settings['threshold_amber'], 'GREEN'),
+            (daily_compliance >= dynamic_settings['threshold_red'], 'AMBER'),
+            else_='RED'
+        )
         
         # Build query for daily attendance
-        query = self.db.query(DailyAttendance).filter(
+        daily_stmt = select(
+            DailyAttendance.date,
+            DailyAttendance.first_in,
+            DailyAttendance.last_out,
+            DailyAttendance.in_out_pairs,
+            DailyAttendance.total_office_minutes,
+            DailyAttendance.status,
+            daily_compliance.label('daily_compliance'),
+            daily_status_color.label('daily_status_color')
+        ).where(
             DailyAttendance.employee_code == employee_code
         )
         
         if start_date:
-            query = query.filter(DailyAttendance.date >= start_date)
+            daily_stmt = daily_stmt.where(DailyAttendance.date >= start_date)
         if end_date:
-            query = query.filter(DailyAttendance.date <= end_date)
+            daily_stmt = daily_stmt.where(DailyAttendance.date <= end_date)
         
-        daily_records = query.order_by(DailyAttendance.date.desc()).all()
+        daily_stmt = daily_stmt.order_by(DailyAttendance.date.desc())
         
-        # Get weekly summaries
-        weekly_query = self.db.query(WeeklySummary).filter(
-            WeeklySummary.employee_code == employee_code
-        ).order_by(WeeklySummary.week_start.desc())
+        # Get employee and weekly summaries, newest first, in one round trip
+        employee_weeks = self.db.query(Employee, WeeklySummary).outerjoin(
+            WeeklySummary, WeeklySummary.employee_code == Employee.code
+        ).filter(
+            Employee.code == employee_code
+        ).order_by(WeeklySummary.week_start.desc()).all()
         
-        weekly_summaries = weekly_query.all()
+        if not employee_weeks:
+            return None
         
-        # Calculate overall statistics
-        total_office_minutes = sum(d.total_office_minutes for d in daily_records)
-        total_wfo_days = len([d for d in daily_records if d.status != AttendanceStatus.ABSENT])
+        employee = employee_weeks[0][0]
+        weekly_summaries = [summary for _, summary in employee_weeks if summary is not None]
         
-        # Get dynamic settings for expected hours
-        from routers.settings import get_dynamic_settings
-        dynamic_settings = get_dynamic_settings(self.db)
-        expected_daily_minutes = dynamic_settings['expected_hours_per_day'] * 60
+        daily_records = self.db.execute(daily_stmt).all()
         
-        # Format daily records with compliance
+        # Format daily records, totalling them on the way
+        total_office_minutes = 0
+        total_wfo_days = 0
         daily_data = []
-        for record in daily_records:
-            pairs = json.loads(record.in_out_pairs) if record.in_out_pairs else []
-            
-            # Calculate daily compliance percentage
-            if expected_daily_minutes > 0:
-                daily_compliance = (record.total_office_minutes / expected_daily_minutes) * 100
-            else:
-                daily_compliance = 0
-            
-            # Determine daily status color based on thresholds
-            if daily_compliance > dynamic_settings['threshold_amber']:
-                daily_status_color = 'GREEN'
-            elif daily_compliance >= dynamic_settings['threshold_red']:
-                daily_status_color = 'AMBER'
-            else:
-                daily_status_color = 'RED'
+        for day, first_in, last_out, pairs, minutes, status, daily_compliance, daily_status_color in daily_records:
+            total_office_minutes += minutes
+            if status != AttendanceStatus.ABSENT:
+                total_wfo_days += 1
             
             daily_data.append({
-                'date': record.date.isoformat(),
-                'day': record.date.strftime('%A'),
-                'first_in': record.first_in.strftime('%H:%M') if record.first_in else '-',
-                'last_out': record.last_out.strftime('%H:%M') if record.last_out else '-',
-                'in_out_pairs': pairs,
-                'total_hours': self._format_minutes(record.total_office_minutes),
-                'total_minutes': record.total_office_minutes,
-                'status': record.status.value,
+                'date': day,
+                'day': day.strftime('%A'),
+                'first_in': first_in.strftime('%H:%M') if first_in else '-',
+                'last_out': last_out.strftime('%H:%M') if last_out else '-',
+                'in_out_pairs': pairs or [],
+                'total_hours': format_minutes(minutes),
+                'total_minutes': minutes,
+                'status': status,
                 'daily_compliance': round(daily_compliance, 1),
                 'daily_status_color': daily_status_color
             })
         
         # Format weekly summaries
+        total_compliance = 0
         weekly_data = []
         for summary in weekly_summaries:
+            total_compliance += summary.compliance_percentage
             weekly_data.append({
-                'week_start': summary.week_start.isoformat(),
-                'week_end': summary.week_end.isoformat(),
-                'week_label': f"{summary.week_start.strftime('%d %b')} - {summary.week_end.strftime('%d %b %Y')}",
-                'total_hours': self._format_minutes(summary.total_office_minutes),
-                'total_minutes': summary.total_office_minutes,
+                'week_start': summary.week_start,
+                'week_end': summary.week_end,
+                'week_label': format_week_label(summary.week_start, summary.week_end),
+                'total_hours': format_minutes(summary.total_office_minutes),
                 'total_minutes': summary.total_office_minutes,
                 'wfo_days': summary.wfo_days,
                 'required_wfo_days': employee.required_wfo_days,
                 'compliance_percentage': summary.compliance_percentage,
-                'status': summary.status.value
+                'status': summary.status
             })
         
         # Calculate average compliance
-        avg_compliance = sum(w['compliance_percentage'] for w in weekly_data) / len(weekly_data) if weekly_data else 0
+        avg_compliance = total_compliance / len(weekly_data) if weekly_data else 0
         
         return {
             'employee': {
@@ -264,7 +406,7 @@ class ReportGenerator:
                 'department': employee.department
             },
             'summary': {
-                'total_office_hours': self._format_minutes(total_office_minutes),
+                'total_office_hours': format_minutes(total_office_minutes),
                 'total_wfo_days': total_wfo_days,
                 'avg_compliance': round(avg_compliance, 2),
                 'overall_status': 'GREEN' if avg_compliance > dynamic_settings['threshold_amber'] else ('AMBER' if avg_compliance >= dynamic_settings['threshold_red'] else 'RED')
@@ -273,6 +415,7 @@ class ReportGenerator:
             'weekly_summaries': weekly_data
         }
     
+    @cached_report
     def get_wfo_compliance_report(
         self, 
         week_start: Optional[date] = None
@@ -287,8 +430,7 @@ class ReportGenerator:
             WFO compliance report with all employees
         """
         # Get dynamic settings
-        from routers.settings import get_dynamic_settings
-        dynamic_settings = get_dynamic_settings(self.db)
+        dynamic_settings = self.dynamic_settings
         
         if not week_start:
             # Get latest week
@@ -335,12 +477,12 @@ class ReportGenerator:
                 'employee_code': employee.code,
                 'employee_name': employee.name,
                 'wfo_days': summary.wfo_days,
-                'actual_hours': self._format_minutes(summary.total_office_minutes),
+                'actual_hours': format_minutes(summary.total_office_minutes),
                 'actual_minutes': summary.total_office_minutes,
-                'expected_hours': self._format_minutes(summary.expected_minutes),
+                'expected_hours': format_minutes(summary.expected_minutes),
                 'expected_minutes': summary.expected_minutes,
                 'compliance_percentage': summary.compliance_percentage,
-                'status': summary.status.value,
+                'status': summary.status,
                 'is_compliant': is_compliant
             })
         
@@ -351,9 +493,9 @@ class ReportGenerator:
         week_end = week_start + timedelta(days=6)
         
         return {
-            'week_start': week_start.isoformat(),
-            'week_end': week_end.isoformat(),
-            'week_label': f"{week_start.strftime('%d %b')} - {week_end.strftime('%d %b %Y')}",
+            'week_start': week_start,
+            'week_end': week_end,
+            'week_label': format_week_label(week_start, week_end),
             'expected_wfo_days': dynamic_settings['wfo_days_per_week'],
             'expected_hours_per_day': dynamic_settings['expected_hours_per_day'],
             'employees': employees,
@@ -365,27 +507,18 @@ class ReportGenerator:
             }
         }
     
+    @cached_report
     def get_available_weeks(self) -> List[Dict]:
         """Get list of available weeks in the data"""
-        weeks = self.db.query(
-            WeeklySummary.week_start,
-            WeeklySummary.week_end
-        ).distinct().order_by(WeeklySummary.week_start.desc()).all()
+        weeks = self.db.execute(STMT_AVAILABLE_WEEKS).all()
         
         return [{
-            'week_start': w.week_start.isoformat(),
-            'week_end': w.week_end.isoformat(),
-            'label': f"{w.week_start.strftime('%d %b')} - {w.week_end.strftime('%d %b %Y')}"
+            'week_start': w.week_start,
+            'week_end': w.week_end,
+            'label': format_week_label(w.week_start, w.week_end)
         } for w in weeks]
     
-    def _format_minutes(self, minutes: int) -> str:
-        """Format minutes as human-readable string"""
-        if not minutes:
-            return '0h 0m'
-        hours = minutes // 60
-        mins = minutes % 60
-        return f"{hours}h {mins}m"
-
+    @cached_report
     def get_dashboard_daily_stats(
         self,
         week_start: Optional[date] = None
@@ -400,43 +533,41 @@ class ReportGenerator:
 
         week_end = week_start + timedelta(days=6)
         
-        # Get total active employees count
-        total_employees = self.db.query(Employee).count()
-        
-        # Query daily attendance for this week
-        daily_counts = self.db.query(
-            DailyAttendance.date,
-            func.count(DailyAttendance.id)
-        ).filter(
-            and_(
-                DailyAttendance.date >= week_start,
-                DailyAttendance.date <= week_end,
-                DailyAttendance.status == AttendanceStatus.PRESENT
-            )
-        ).group_by(DailyAttendance.date).all()
+        # Calendar of the week's 7 days, left-joined to the PRESENT records so
+        # every day comes back with its count (days are built as literals, which
+        # works on both SQLite and PostgreSQL)
+        calendar = union_all(*[
+            select(literal(week_start + timedelta(days=offset), Date).label('day'))
+            for offset in range(7)
+        ]).cte('calendar')
+        
+        # Per-day WFO counts plus the total active employee count in one query
+        daily_counts = self.db.execute(
+            select(
+                calendar.c.day,
+                func.count(DailyAttendance.id),
+                STMT_EMPLOYEE_COUNT.scalar_subquery()
+            ).select_from(calendar).outerjoin(
+                DailyAttendance,
+                and_(
+                    DailyAttendance.date == calendar.c.day,
+                    DailyAttendance.status == AttendanceStatus.PRESENT
+                )
+            ).group_by(calendar.c.day).order_by(calendar.c.day)
+        ).all()
         
-        counts_map = {d: c for d, c in daily_counts}
+        # Showing all 7 days for completeness
+        stats = [{
+            'date': day,
+            'day': day.strftime('%a'),
+            'wfo': wfo_count,
+            'wfh': max(0, total_employees - wfo_count)
+        } for day, wfo_count, total_employees in daily_counts]
         
-        stats = []
-        current = week_start
-        while current <= week_end:
-            # Skip weekends if needed? User didn't specify, but usually M-F. 
-            # Showing all 7 days for completeness.
-            wfo_count = counts_map.get(current, 0)
-            wfh_count = max(0, total_employees - wfo_count)
-            
-            stats.append({
-                'date': current.isoformat(),
-                'day': current.strftime('%a'),
-                'wfo': wfo_count,
-                'wfh': wfh_count
-            })
-            current += timedelta(days=1)
-            
         return {
-            'week_start': week_start.isoformat(),
-            'week_end': week_end.isoformat(),
-            'week_label': f"{week_start.strftime('%d %b')} - {week_end.strftime('%d %b %Y')}",
+            'week_start': week_start,
+            'week_end': week_end,
+            'week_label': format_week_label(week_start, week_end),
             'stats': stats
         }
 
@@ -448,43 +579,55 @@ class ReportGenerator:
         """Get list of employees for specific day and status"""
         target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         
-        # Get all daily attendance for this date
-        daily_records = self.db.query(
-            DailyAttendance
-        ).filter(
-            DailyAttendance.date == target_date
-        ).all()
-        
-        present_employees = {d.employee_code: d for d in daily_records if d.status == AttendanceStatus.PRESENT}
-        
-        results = []
-        all_employees = self.db.query(Employee).all()
+        present_on_day = and_(
+            DailyAttendance.employee_code == Employee.code,
+            DailyAttendance.date == target_date,
+            DailyAttendance.status == AttendanceStatus.PRESENT
+        )
         
-        for emp in all_employees:
-            record = present_employees.get(emp.code)
-            is_present = record is not None
+        if status_category == 'WFO':
+            # Employees with a PRESENT record for the day
+            present = self.db.query(
+                Employee.code,
+                Employee.name,
+                Employee.department,
+                DailyAttendance.total_office_minutes,
+                DailyAttendance.first_in,
+                DailyAttendance.last_out
+            ).join(
+                DailyAttendance, present_on_day
+            ).order_by(Employee.id)
+            
+            return [{
+                'employee_code': code,
+                'employee_name': name,
+                'department': department,
+                'status': 'PRESENT',
+                'hours': format_minutes(minutes),
+                'in_time': first_in.strftime('%H:%M') if first_in else '-',
+                'out_time': last_out.strftime('%H:%M') if last_out else '-'
+            } for code, name, department, minutes, first_in, last_out in present.all()]
+        
+        if status_category == 'WFH':
+            # WFH or Absent: employees without a PRESENT record for the day
+            not_present = self.db.query(
+                Employee.code,
+                Employee.name,
+                Employee.department
+            ).outerjoin(
+                DailyAttendance, present_on_day
+            ).filter(
+                DailyAttendance.id.is_(None)
+            ).order_by(Employee.id)
             
-            # Determine if matches filter
-            if status_category == 'WFO' and is_present:
-                results.append({
-                    'employee_code': emp.code,
-                    'employee_name': emp.name,
-                    'department': emp.department,
-                    'status': 'PRESENT',
-                    'hours': self._format_minutes(record.total_office_minutes),
-                    'in_time': record.first_in.strftime('%H:%M') if record.first_in else '-',
-                    'out_time': record.last_out.strftime('%H:%M') if record.last_out else '-'
-                })
-            elif status_category == 'WFH' and not is_present:
-                # WFH or Absent
-                results.append({
-                    'employee_code': emp.code,
-                    'employee_name': emp.name,
-                    'department': emp.department,
-                    'status': 'WFH/ABSENT',
-                    'hours': '0h 0m',
-                    'in_time': '-',
-                    'out_time': '-'
-                })
-                
-        return results
+            return [{
+                'employee_code': code,
+                'employee_name': name,
+                'department': department,
+                'status': 'WFH/ABSENT',
+                'hours': '0h 0m',
+                'in_time': '-',
+                'out_time': '-'
+            } for code, name, department in not_present.all()]
+        
+        return []
@@ -5,10 +5,10 @@ daily totals, weekly aggregation, and compliance calculations
 """
 from datetime import datetime, date, time, timedelta
 from typing import List, Dict, Optional, Tuple
-from collections import defaultdict
-import json
 import logging
 
+from config import get_status_colors
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,33 +24,75 @@ class TimeCalculator:
         self.expected_daily_minutes = expected_hours_per_day * 60
         self.expected_weekly_minutes = wfo_days_per_week * expected_hours_per_day * 60
     
-    def calculate_daily_summary(self, records: List[Dict]) -> Dict[str, Dict[date, Dict]]:
+    def calculate_daily_summary_df(self, df) -> Dict[str, Dict[date, Dict]]:
         """
-        Calculate daily attendance summary for each employee
+        Calculate daily attendance summaries from a DataFrame of records
+        
+        The DataFrame needs the record columns code, date, in_time,
+        out_time, in_minute, out_minute, total_time and remark. Days with a
+        single record, the usual case, are computed column-wise; days with
+        several IN/OUT records go through the pairing in _calculate_day_summary.
         
         Args:
-            records: List of attendance records from parser
+            df: Attendance records, one row per record
         
         Returns:
             Dict mapping employee_code -> date -> daily_summary
         """
-        # Group records by employee and date
-        employee_date_records = defaultdict(lambda: defaultdict(list))
+        import numpy as np
         
-        for record in records:
-            emp_code = record['code']
-            rec_date = record['date']
-            employee_date_records[emp_code][rec_date].append(record)
+        keys = ['code', 'date']
+        day_size = df.groupby(keys, sort=False)['code'].transform('size')
+        single = df[day_size == 1]
+        day_summaries = {}
         
-        # Calculate daily summary for each employee-date combination
-        summaries = {}
+        # Single-record days: one optional IN, one optional OUT
+        ins = single['in_time'].to_numpy(dtype=object)
+        outs = single['out_time'].to_numpy(dtype=object)
+        has_in = single['in_time'].notna().to_numpy()
+        paired = has_in & single['out_time'].notna().to_numpy()
+        paired[paired] = outs[paired] > ins[paired]
         
-        for emp_code, date_records in employee_date_records.items():
-            summaries[emp_code] = {}
-            
-            for rec_date, day_records in date_records.items():
-                summary = self._calculate_day_summary(day_records)
-                summaries[emp_code][rec_date] = summary
+        duration = np.where(paired, (single['out_minute'] - single['in_minute']).fillna(0), 0).astype(int)
+        device_minutes = single['total_time'].map(
+            {t: self._time_to_minutes(t) for t in single['total_time'].dropna().unique()}
+        )
+        total_minutes = np.where(
+            device_minutes.notna(), device_minutes.fillna(0), np.maximum(duration, 0)
+        ).astype(int).tolist()
+        status = np.where(
+            np.array(total_minutes) >= self.min_minutes_for_present, 'PRESENT', 'ABSENT'
+        ).tolist()
+        
+        rows = zip(
+            single['code'], single['date'], ins, outs, single['in_minute'], single['out_minute'],
+            has_in.tolist(), paired.tolist(), duration.tolist(), total_minutes, status, single['remark']
+        )
+        for code, day, in_time, out_time, in_minute, out_minute, has_in, paired, minutes, total, day_status, remark in rows:
+            pairs = None
+            if has_in:
+                pairs = [{
+                    'in': self._format_clock(in_minute),
+                    'out': self._format_clock(out_minute) if paired else None,
+                    'duration': self.format_minutes(minutes) if paired else None
+                }]
+            day_summaries[(code, day)] = {
+                'total_office_minutes': total,
+                'status': day_status,
+                'first_in': in_time,
+                'last_out': out_time,
+                'in_out_pairs': pairs,
+                'remark': remark or None
+            }
+        
+        # Multi-record days need the IN/OUT pairing
+        for (code, day), day_records in df[day_size > 1].groupby(keys, sort=False):
+            day_summaries[(code, day)] = self._calculate_day_summary(day_records.to_dict('records'))
+        
+        # Nest by employee, in order of first appearance
+        summaries = {}
+        for code, day in df[keys].drop_duplicates().itertuples(index=False, name=None):
+            summaries.setdefault(code, {})[day] = day_summaries[(code, day)]
         
         return summaries
     
@@ -78,12 +120,15 @@ class TimeCalculator:
             if record.get('remark'):
                 remark = record['remark']
         
+        # Match IN/OUT pairs once, for both the total and the display
+        paired_minutes, pairs = self._pair_times(in_times, out_times)
+        
         # If total time is provided by device, use it
         if total_from_device:
             total_minutes = self._time_to_minutes(total_from_device)
         else:
             # Calculate from IN/OUT pairs
-            total_minutes = self._calculate_from_pairs(in_times, out_times)
+            total_minutes = paired_minutes
         
         # Determine status
         # Determine status (Strict 6-hour rule)
@@ -97,15 +142,12 @@ class TimeCalculator:
         first_in = min(in_times) if in_times else None
         last_out = max(out_times) if out_times else None
         
-        # Create IN/OUT pairs for display
-        pairs = self._create_pairs(in_times, out_times)
-        
         return {
             'total_office_minutes': total_minutes,
             'status': status,
             'first_in': first_in,
             'last_out': last_out,
-            'in_out_pairs': json.dumps(pairs) if pairs else None,
+            'in_out_pairs': pairs or None,
             'remark': remark
         }
     
@@ -115,52 +157,36 @@ class TimeCalculator:
             return 0
         return t.hour * 60 + t.minute
     
-    def _calculate_from_pairs(self, in_times: List[time], out_times: List[time]) -> int:
+    def _format_clock(self, minute_of_day) -> str:
+        """Format a minute of the day as HH:MM"""
+        return f"{int(minute_of_day) // 60:02d}:{int(minute_of_day) % 60:02d}"
+    
+    def _pair_times(self, in_times: List[time], out_times: List[time]) -> Tuple[int, List[Dict]]:
         """
-        Calculate total time from IN/OUT pairs
+        Match IN and OUT times, for the day's total and for display
         
         Algorithm:
-        1. Sort both lists
-        2. For each IN, find the next OUT after it
-        3. Calculate duration and add to total
-        """
-        if not in_times or not out_times:
-            return 0
+        1. Sort both lists once
+        2. For each IN, take the next unused OUT after it; OUTs skipped on
+           the way are at or before this IN, so no later IN can use them
+        3. For the total, the OUT must also fall in a later minute, so it
+           keeps its own cursor over the OUTs
         
+        Returns:
+            Tuple of (total paired minutes, IN/OUT pairs for display)
+        """
         sorted_ins = sorted(in_times)
         sorted_outs = sorted(out_times)
+        out_minutes = [self._time_to_minutes(t) for t in sorted_outs]
+        out_count = len(sorted_outs)
         
         total_minutes = 0
-        used_outs = set()
-        
-        for in_time in sorted_ins:
-            # Find the next available OUT after this IN
-            for i, out_time in enumerate(sorted_outs):
-                if i in used_outs:
-                    continue
-                if out_time > in_time:
-                    # Calculate duration
-                    in_minutes = self._time_to_minutes(in_time)
-                    out_minutes = self._time_to_minutes(out_time)
-                    duration = out_minutes - in_minutes
-                    
-                    if duration > 0:
-                        total_minutes += duration
-                        used_outs.add(i)
-                        break
-        
-        return total_minutes
-    
-    def _create_pairs(self, in_times: List[time], out_times: List[time]) -> List[Dict]:
-        """Create list of IN/OUT pairs for display"""
         pairs = []
-        
-        sorted_ins = sorted(in_times) if in_times else []
-        sorted_outs = sorted(out_times) if out_times else []
-        
-        used_outs = set()
+        pair_idx = 0
+        total_idx = 0
         
         for in_time in sorted_ins:
+            in_minutes = self._time_to_minutes(in_time)
             pair = {
                 'in': in_time.strftime('%H:%M') if in_time else None,
                 'out': None,
@@ -168,86 +194,99 @@ class TimeCalculator:
             }
             
             # Find matching OUT
-            for i, out_time in enumerate(sorted_outs):
-                if i in used_outs:
-                    continue
-                if out_time > in_time:
-                    pair['out'] = out_time.strftime('%H:%M')
-                    duration = self._time_to_minutes(out_time) - self._time_to_minutes(in_time)
-                    pair['duration'] = f"{duration // 60}h {duration % 60}m"
-                    used_outs.add(i)
-                    break
-            
+            while pair_idx < out_count and sorted_outs[pair_idx] <= in_time:
+                pair_idx += 1
+            if pair_idx < out_count:
+                pair['out'] = sorted_outs[pair_idx].strftime('%H:%M')
+                duration = out_minutes[pair_idx] - in_minutes
+                pair['duration'] = f"{duration // 60}h {duration % 60}m"
+                pair_idx += 1
             pairs.append(pair)
+            
+            # Find the OUT that counts towards the total
+            while total_idx < out_count and out_minutes[total_idx] <= in_minutes:
+                total_idx += 1
+            if total_idx < out_count:
+                total_minutes += out_minutes[total_idx] - in_minutes
+                total_idx += 1
         
-        return pairs
+        return total_minutes, pairs
     
-    def calculate_weekly_summary(
-        self, 
+    def calculate_weekly_summaries(
+        self,
         daily_summaries: Dict[str, Dict[date, Dict]],
-        week_start: date,
-        week_end: date,
-        employee_requirements: Dict[str, int] = None
-    ) -> Dict[str, Dict]:
+        weeks: List[Tuple[date, date]]
+    ) -> List[Dict]:
         """
-        Calculate weekly summary for each employee
+        Calculate weekly summaries for several weeks at once
+        
+        Every day is bucketed into its week and totalled in one groupby
+        instead of rescanning all days once per week. Weeks run Monday to
+        Sunday, as returned by get_all_weeks.
         
         Args:
-            daily_summaries: Output from calculate_daily_summary
-            week_start: Start of the week
-            week_end: End of the week
-            employee_requirements: Dict of {emp_code: required_wfo_days}
+            daily_summaries: Output from calculate_daily_summary_df
+            weeks: List of (week_start, week_end) tuples
         
         Returns:
-            Dict mapping employee_code -> weekly_summary
+            WeeklySummary rows (with employee_code), in week then employee
+            order, ready for a bulk upsert
         """
-        weekly = {}
-        employee_requirements = employee_requirements or {}
+        import numpy as np
+        import pandas as pd
         
-        for emp_code, date_summaries in daily_summaries.items():
-            total_minutes = 0
-            wfo_days = 0
-            
-            for day_date, summary in date_summaries.items():
-                if week_start <= day_date <= week_end:
-                    total_minutes += summary.get('total_office_minutes', 0)
-                    if summary.get('status') in ['PRESENT', 'PARTIAL']:
-                        wfo_days += 1
-            
-            # Determine expected minutes based on ACTUAL days worked
-            # User request: "expected hours should be Number of WFO per employee worked * 8"
-            expected_minutes = wfo_days * self.expected_hours_per_day * 60
-            
-            # Calculate compliance percentage (no cap - allow >100% for overtime)
-            if expected_minutes > 0:
-                compliance = (total_minutes / expected_minutes) * 100
-                # No cap - employees who work more show >100%
-            else:
-                compliance = 0
-            
-            # Determine status color
-            status = self._get_status_color(compliance)
-            
-            weekly[emp_code] = {
+        codes = list(daily_summaries)
+        if not codes or not weeks:
+            return []
+        
+        days = pd.DataFrame(
+            [
+                (
+                    day - timedelta(days=day.weekday()),
+                    emp_code,
+                    summary.get('total_office_minutes', 0),
+                    summary.get('status') in ['PRESENT', 'PARTIAL']
+                )
+                for emp_code, date_summaries in daily_summaries.items()
+                for day, summary in date_summaries.items()
+            ],
+            columns=['week_start', 'code', 'total_minutes', 'wfo_days']
+        )
+        
+        # Every employee gets a row for every week, in week then employee order
+        totals = days.groupby(['week_start', 'code'], sort=False)[['total_minutes', 'wfo_days']].sum().reindex(
+            pd.MultiIndex.from_product([[week_start for week_start, _ in weeks], codes]), fill_value=0
+        )
+        total_minutes = totals['total_minutes'].to_numpy()
+        wfo_days = totals['wfo_days'].to_numpy()
+        
+        # Expected minutes follow the days actually worked: WFO days * expected hours
+        # Compliance is not capped, so overtime shows as more than 100%
+        expected_minutes = wfo_days * self.expected_hours_per_day * 60
+        compliance = np.zeros(len(totals))
+        worked = expected_minutes > 0
+        compliance[worked] = (total_minutes[worked] / expected_minutes[worked]) * 100
+        
+        statuses = get_status_colors(compliance, self.threshold_red, self.threshold_amber)
+        week_ends = dict(weeks)
+        
+        rows = zip(
+            totals.index, total_minutes.tolist(), wfo_days.tolist(),
+            expected_minutes.tolist(), compliance.tolist(), statuses
+        )
+        return [
+            {
+                'employee_code': emp_code,
                 'week_start': week_start,
-                'week_end': week_end,
-                'total_office_minutes': total_minutes,
-                'wfo_days': wfo_days,
-                'expected_minutes': expected_minutes,
-                'compliance_percentage': round(compliance, 2),
+                'week_end': week_ends[week_start],
+                'total_office_minutes': minutes,
+                'wfo_days': days_in_office,
+                'expected_minutes': expected,
+                'compliance_percentage': round(percentage, 2),
                 'status': status
             }
-        
-        return weekly
-    
-    def _get_status_color(self, percentage: float) -> str:
-        """Get status color based on percentage"""
-        if percentage < self.threshold_red:
-            return "RED"
-        elif percentage <= self.threshold_amber:
-            return "AMBER"
-        else:
-            return "GREEN"
+            for (week_start, emp_code), minutes, days_in_office, expected, percentage, status in rows
+        ]
     
     def get_week_bounds(self, d: date) -> Tuple[date, date]:
         """Get the Monday and Sunday of the week containing the given date"""
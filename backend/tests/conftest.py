@@ -0,0 +1,46 @@
+"""
+Shared fixtures for the backend tests
+
+The app reads DATABASE_URL at import, so it is pointed at a throwaway
+SQLite file before any backend module is loaded.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/test.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from database import Base, SessionLocal, engine, init_db  # noqa: E402
+from routers.settings import invalidate_settings_cache  # noqa: E402
+from services import report_generator  # noqa: E402
+import main  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """Fresh schema and empty process caches for every test"""
+    init_db()
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    invalidate_settings_cache()
+    report_generator._report_cache.clear()
+    
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    """API client backed by the test database"""
+    with TestClient(main.app) as test_client:
+        yield test_client
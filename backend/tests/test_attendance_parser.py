@@ -0,0 +1,67 @@
+"""
+Tests for reading attendance exports
+"""
+import codecs
+
+import pytest
+
+from services import attendance_parser
+from services.attendance_parser import AttendanceParser
+
+HEADER = "DATE,CODE,NAME,IN,OUT\n"
+ROWS = "01/12/2025,101,Ann Lee,09:00,18:00\n01/12/2025,102,Renée Roy,09:30,18:30\n"
+
+
+def parsed_names(content, filename="export.csv"):
+    df = AttendanceParser().parse_file(content, filename)
+    return list(df['name'])
+
+
+def test_utf8_csv():
+    assert parsed_names((HEADER + ROWS).encode('utf-8')) == ["Ann Lee", "Renée Roy"]
+
+
+def test_latin1_csv_falls_back_from_utf8():
+    assert parsed_names((HEADER + ROWS).encode('latin-1')) == ["Ann Lee", "Renée Roy"]
+
+
+def test_latin1_byte_past_the_first_rows():
+    rows = "01/12/2025,101,Ann Lee,09:00,18:00\n" * 5000 + "02/12/2025,102,Renée Roy,09:30,18:30\n"
+    
+    names = parsed_names((HEADER + rows).encode('latin-1'))
+    
+    assert names[-1] == "Renée Roy"
+
+
+@pytest.mark.skipif(not attendance_parser.HAS_PYARROW, reason="needs pyarrow")
+def test_latin1_csv_skips_the_utf8_retry(monkeypatch):
+    read_csv = attendance_parser.pd.read_csv
+    calls = []
+    
+    def spy(*args, **kwargs):
+        calls.append((kwargs.get('engine'), kwargs.get('encoding')))
+        return read_csv(*args, **kwargs)
+    
+    monkeypatch.setattr(attendance_parser.pd, 'read_csv', spy)
+    
+    assert parsed_names((HEADER + ROWS).encode('latin-1')) == ["Ann Lee", "Renée Roy"]
+    assert calls == [('pyarrow', None), (None, 'latin-1')]
+
+
+def test_latin1_header_falls_back_to_c_engine():
+    content = ("DATE,CODE,NAME,IN,OUT,REMARQUÉ\n" + ROWS.replace("\n", ",\n")).encode('latin-1')
+    
+    assert parsed_names(content) == ["Ann Lee", "Renée Roy"]
+
+
+def test_utf16_csv_with_bom():
+    content = codecs.BOM_UTF16_LE + (HEADER + ROWS).encode('utf-16-le')
+    
+    assert parsed_names(content) == ["Ann Lee", "Renée Roy"]
+
+
+def test_csv_read_from_path(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_bytes((HEADER + ROWS).encode('latin-1'))
+    
+    assert parsed_names(str(path)) == ["Ann Lee", "Renée Roy"]
@@ -0,0 +1,73 @@
+"""
+Tests for the employees router
+"""
+from models.employee import Employee
+from routers.employees import prefix_upper_bound
+
+
+def add_employees(db, *rows):
+    db.add_all(Employee(code=code, name=name) for code, name in rows)
+    db.commit()
+
+
+def search_codes(client, term):
+    response = client.get("/api/employees/", params={"search": term})
+    assert response.status_code == 200, response.text
+    return sorted(emp["code"] for emp in response.json()["employees"])
+
+
+def test_prefix_upper_bound():
+    assert prefix_upper_bound("ab") == "ac"
+    assert prefix_upper_bound("a\U0010ffff") == "b"
+    assert prefix_upper_bound("\U0010ffff\U0010ffff") is None
+    assert prefix_upper_bound("a\ud7ff") == "a\ue000"
+
+
+def test_search_matches_name_or_code_prefix(client, db):
+    add_employees(db, ("101", "Nikhil Rao"), ("102", "Anita Nik"), ("N7", "Zoe"))
+    
+    assert search_codes(client, "nik") == ["101"]
+    assert search_codes(client, "N") == ["101", "N7"]
+    assert search_codes(client, "10") == ["101", "102"]
+
+
+def test_search_term_ending_in_non_ascii(client, db):
+    add_employees(db, ("201", "Renée Das"), ("202", "René Roy"), ("203", "Renf Oak"))
+    
+    assert search_codes(client, "René") == ["201", "202"]
+    assert search_codes(client, "RENÉE") == []  # lower() only folds ASCII, like SQLite's
+    assert search_codes(client, "Renée") == ["201"]
+
+
+def test_search_term_ending_in_max_code_point(client, db):
+    add_employees(db, ("301", "A\U0010ffffB"), ("302", "B"), ("303", "\U0010ffff"))
+    
+    assert search_codes(client, "a\U0010ffff") == ["301"]
+    assert search_codes(client, "\U0010ffff") == ["303"]
+
+
+def test_search_term_ending_before_surrogates(client, db):
+    add_employees(db, ("401", "\ud7ffA"), ("402", "\ue000"), ("403", "\ud7fe"))
+    
+    assert search_codes(client, "\ud7ff") == ["401"]
+
+
+def test_update_unknown_employee_keeps_data_version(client, db):
+    add_employees(db, ("101", "Nikhil Rao"))
+    etag = client.get("/api/reports/weeks").headers["etag"]
+    
+    response = client.put("/api/employees/NOPE", params={"name": "x"})
+    
+    assert response.status_code == 404
+    assert client.get("/api/reports/weeks").headers["etag"] == etag
+
+
+def test_update_employee_bumps_data_version(client, db):
+    add_employees(db, ("101", "Nikhil Rao"))
+    etag = client.get("/api/reports/weeks").headers["etag"]
+    
+    response = client.put("/api/employees/101", params={"department": "HR"})
+    
+    assert response.status_code == 200
+    assert response.json()["department"] == "HR"
+    assert client.get("/api/reports/weeks").headers["etag"] != etag
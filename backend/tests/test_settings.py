@@ -0,0 +1,52 @@
+"""
+Tests for the settings router
+"""
+from sqlalchemy import event
+
+from database import engine
+from models.settings import AppSettings
+from routers.settings import set_setting_values, new_data_version
+
+
+def test_settings_change_from_another_process_is_not_served_stale(client, db):
+    # Fill this process's settings cache
+    before = client.get("/api/settings")
+    assert before.json()["expected_hours_per_day"] == 8
+    
+    # Another worker writes new settings; this process's cache is never invalidated
+    set_setting_values(db, {
+        AppSettings.EXPECTED_HOURS_PER_DAY: "6",
+        AppSettings.DATA_VERSION: new_data_version(),
+    })
+    db.commit()
+    
+    after = client.get("/api/settings", headers={"If-None-Match": before.headers["etag"]})
+    
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    assert after.json()["expected_hours_per_day"] == 6
+
+
+def test_settings_revalidate_with_etag(client, db):
+    first = client.get("/api/settings")
+    
+    second = client.get("/api/settings", headers={"If-None-Match": first.headers["etag"]})
+    
+    assert second.status_code == 304
+
+
+def test_warm_settings_read_only_queries_data_version(client, db):
+    client.get("/api/settings")
+    statements = []
+    
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/api/settings")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    
+    assert response.status_code == 200
+    assert len(statements) == 1
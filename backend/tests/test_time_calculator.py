@@ -0,0 +1,110 @@
+"""
+Tests for the daily and weekly attendance calculations
+"""
+from datetime import date, time
+
+from services.attendance_parser import AttendanceParser
+from services.time_calculator import TimeCalculator
+
+EXPORT = b"""DATE,CODE,NAME,IN,OUT,TOTAL,REMARK
+01/12/2025,102,A,09:00,18:00,,P
+01/12/2025,116,B,09:15,13:00,,
+01/12/2025,116,B,14:00,17:45,,
+02/12/2025,102,A,09:00,,,
+02/12/2025,116,B,10:00,12:00,08:30:00,WFO
+08/12/2025,102,A,09:00,13:00,,
+"""
+
+
+def daily_summaries():
+    df = AttendanceParser().parse_file(EXPORT, "export.csv")
+    return TimeCalculator().calculate_daily_summary_df(df)
+
+
+def test_single_record_day():
+    assert daily_summaries()['102'][date(2025, 12, 1)] == {
+        'total_office_minutes': 540,
+        'status': 'PRESENT',
+        'first_in': time(9, 0),
+        'last_out': time(18, 0),
+        'in_out_pairs': [{'in': '09:00', 'out': '18:00', 'duration': '9h 0m'}],
+        'remark': 'P'
+    }
+
+
+def test_missing_out_counts_no_time():
+    assert daily_summaries()['102'][date(2025, 12, 2)] == {
+        'total_office_minutes': 0,
+        'status': 'ABSENT',
+        'first_in': time(9, 0),
+        'last_out': None,
+        'in_out_pairs': [{'in': '09:00', 'out': None, 'duration': None}],
+        'remark': None
+    }
+
+
+def test_multi_record_day_is_paired():
+    assert daily_summaries()['116'][date(2025, 12, 1)] == {
+        'total_office_minutes': 450,
+        'status': 'PRESENT',
+        'first_in': time(9, 15),
+        'last_out': time(17, 45),
+        'in_out_pairs': [
+            {'in': '09:15', 'out': '13:00', 'duration': '3h 45m'},
+            {'in': '14:00', 'out': '17:45', 'duration': '3h 45m'}
+        ],
+        'remark': None
+    }
+
+
+def test_device_total_overrides_punches():
+    summary = daily_summaries()['116'][date(2025, 12, 2)]
+    
+    assert summary['total_office_minutes'] == 510
+    assert summary['status'] == 'PRESENT'
+    assert summary['remark'] == 'WFO'
+
+
+def test_days_below_minimum_hours_are_absent():
+    summary = daily_summaries()['102'][date(2025, 12, 8)]
+    
+    assert summary['total_office_minutes'] == 240
+    assert summary['status'] == 'ABSENT'
+
+
+def test_weekly_summaries_cover_every_employee_and_week():
+    calculator = TimeCalculator()
+    summaries = daily_summaries()
+    weeks = [(date(2025, 12, 1), date(2025, 12, 7)), (date(2025, 12, 8), date(2025, 12, 14))]
+    
+    rows = calculator.calculate_weekly_summaries(summaries, weeks)
+    
+    assert [
+        (row['week_start'], row['employee_code'], row['total_office_minutes'], row['wfo_days'],
+         row['expected_minutes'], row['compliance_percentage'], row['status'])
+        for row in rows
+    ] == [
+        (date(2025, 12, 1), '102', 540, 1, 480, 112.5, 'GREEN'),
+        (date(2025, 12, 1), '116', 960, 2, 960, 100.0, 'GREEN'),
+        (date(2025, 12, 8), '102', 240, 0, 0, 0.0, 'RED'),
+        (date(2025, 12, 8), '116', 0, 0, 0, 0.0, 'RED'),
+    ]
+    assert {row['week_end'] for row in rows} == {date(2025, 12, 7), date(2025, 12, 14)}
+
+
+def test_weekly_status_thresholds():
+    calculator = TimeCalculator(threshold_red=70, threshold_amber=90)
+    monday = date(2025, 12, 1)
+    summaries = {
+        code: {monday: {'total_office_minutes': minutes, 'status': 'PRESENT'}}
+        for code, minutes in [('A', 400), ('B', 300), ('C', 432), ('D', 336)]
+    }
+    
+    rows = calculator.calculate_weekly_summaries(summaries, [(monday, date(2025, 12, 7))])
+    
+    assert [(row['employee_code'], row['compliance_percentage'], row['status']) for row in rows] == [
+        ('A', 83.33, 'AMBER'),
+        ('B', 62.5, 'RED'),
+        ('C', 90.0, 'AMBER'),
+        ('D', 70.0, 'AMBER'),
+    ]
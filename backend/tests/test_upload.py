@@ -0,0 +1,79 @@
+"""
+Tests for the upload router
+"""
+from datetime import datetime, timedelta
+import tempfile
+
+from config import settings
+from models.upload_job import UploadJob, UploadStatus
+from routers import upload
+
+
+def upload_csv(client, text):
+    return client.post("/api/upload/", files={"file": ("export.csv", text.encode(), "text/csv")})
+
+
+def test_upload_without_valid_records_is_rejected(client):
+    response = upload_csv(client, "DATE,CODE,NAME,IN,OUT\nnot-a-date,,,,\n")
+    
+    assert response.status_code == 400
+    assert "No valid records" in response.json()["detail"]
+
+
+def test_upload_stores_parsed_records(client):
+    response = upload_csv(
+        client,
+        "DATE,CODE,NAME,IN,OUT\n"
+        "01/12/2025,102,Abhishek Kadu,09:00,18:00\n"
+        "01/12/2025,116,Arif Shaikh,09:15,17:45\n"
+    )
+    
+    # Summaries are calculated after the response, so the job starts out pending
+    assert response.status_code == 202, response.text
+    assert response.json()["status"] == "PENDING"
+    
+    job_response = client.get(f"/api/upload/{response.json()['job_id']}")
+    assert job_response.status_code == 200
+    job = job_response.json()
+    assert job["status"] == "COMPLETED", job
+    assert job["stats"]["records_parsed"] == 2
+    assert job["stats"]["daily_summaries_created"] == 2
+    assert job["stats"]["weekly_summaries_created"] == 2
+    assert client.get("/api/employees/").json()["total"] == 2
+
+
+def test_stale_unfinished_job_is_reported_failed(client, db):
+    created = datetime.utcnow() - timedelta(seconds=settings.UPLOAD_JOB_TIMEOUT + 60)
+    stale = UploadJob(filename="old.csv", status=UploadStatus.PENDING.value, created_at=created)
+    fresh = UploadJob(filename="new.csv", status=UploadStatus.PROCESSING.value)
+    db.add_all([stale, fresh])
+    db.commit()
+    
+    stale_job = client.get(f"/api/upload/{stale.id}").json()
+    fresh_job = client.get(f"/api/upload/{fresh.id}").json()
+    
+    assert stale_job["status"] == "FAILED"
+    assert stale_job["error"]
+    assert fresh_job["status"] == "PROCESSING"
+
+
+def test_failed_copy_removes_temp_file(client, tmp_path, monkeypatch):
+    def fail_copy(*args):
+        raise OSError("No space left on device")
+    
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(upload.shutil, "copyfileobj", fail_copy)
+    
+    response = upload_csv(client, "DATE,CODE,NAME,IN,OUT\n01/12/2025,102,A,09:00,18:00\n")
+    
+    assert response.status_code == 500
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_parsed_upload_removes_temp_file(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    
+    response = upload_csv(client, "DATE,CODE,NAME,IN,OUT\nnot-a-date,,,,\n")
+    
+    assert response.status_code == 400
+    assert list(tmp_path.iterdir()) == []
@@ -87,6 +87,8 @@ export const api = {
         });
     },
 
+    getUploadJob: (jobId) => request(`/upload/${jobId}`),
+
     // Employees
     getEmployees: (params = {}) => {
         const searchParams = new URLSearchParams(params);
@@ -3,6 +3,12 @@ import { Upload, FileSpreadsheet, Info } from 'lucide-react';
 import api from '../api/client';
 import FileUpload from '../components/FileUpload';
 
+// Job polling backs off from 1s to 10s and gives up after 20 minutes
+// (the backend reports jobs stuck past its own deadline as FAILED first)
+const POLL_INITIAL_DELAY_MS = 1000;
+const POLL_MAX_DELAY_MS = 10000;
+const POLL_TIMEOUT_MS = 20 * 60 * 1000;
+
 export default function UploadData() {
     const [isLoading, setIsLoading] = useState(false);
 
@@ -10,7 +16,23 @@ export default function UploadData() {
         setIsLoading(true);
         try {
             const result = await api.uploadFile(file);
-            return result;
+
+            // Summaries are calculated in the background; wait for the job to finish
+            let job = result;
+            let delay = POLL_INITIAL_DELAY_MS;
+            const deadline = Date.now() + POLL_TIMEOUT_MS;
+            while (job.status === 'PENDING' || job.status === 'PROCESSING') {
+                if (Date.now() + delay > deadline) {
+                    throw new Error('Timed out waiting for the upload to finish processing. Please check the reports later or upload the file again.');
+                }
+                await new Promise((resolve) => setTimeout(resolve, delay));
+                delay = Math.min(delay * 1.5, POLL_MAX_DELAY_MS);
+                job = await api.getUploadJob(result.job_id);
+            }
+            if (job.status === 'FAILED') {
+                throw new Error(job.error || job.message);
+            }
+            return { ...result, message: job.message, stats: job.stats };
         } finally {
             setIsLoading(false);
         }